@@ -0,0 +1,40 @@
+import functools
+import operator
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from spdm.common.logger import logger
+from spdm.data.Function import Function
+
+NUM_SPECIES = 48
+NUM_KNOTS = 2000
+NUM_POINTS = 1000000
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+
+    species = []
+    for s in range(NUM_SPECIES):
+        x = np.sort(np.append(rng.uniform(0.0, 1.0, NUM_KNOTS-2), [0.0, 1.0]))
+        species.append(Function(x, np.exp(-x*(s+1)) * (1.0+0.1*np.sin(x*(s+3)))))
+
+    expr = functools.reduce(operator.add, [f*(s+1) for s, f in enumerate(species)])
+
+    x = np.linspace(0.0, 1.0, NUM_POINTS)
+
+    start = time.perf_counter()
+    expected = expr(x)
+    serial = time.perf_counter()-start
+    logger.info(f"serial     : {serial:8.3f} s")
+
+    num_workers = 1
+    while num_workers <= (os.cpu_count() or 1):
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            start = time.perf_counter()
+            res = expr(x, executor=executor)
+            elapsed = time.perf_counter()-start
+        assert np.allclose(res, expected)
+        logger.info(f"workers={num_workers:3d} : {elapsed:8.3f} s  speedup={serial/elapsed:5.2f}")
+        num_workers *= 2
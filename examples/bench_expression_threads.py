@@ -0,0 +1,32 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from spdm.common.logger import logger
+from spdm.data.Function import Function, numeric_policy
+
+NUM_POINTS = 1000
+NUM_CALLS = 2000
+
+
+def _evaluate(expr, x, policy, count):
+    with numeric_policy(policy):
+        for _ in range(count):
+            expr(x)
+
+
+if __name__ == '__main__':
+    x = np.linspace(0, 1.0, NUM_POINTS)
+    fun = Function(x, np.sin(x*np.pi)+1.0)
+    expr = (fun*2.0 + np.exp(fun)) / (fun+1.0)
+
+    for policy in ("raise", "warn", "ignore", "record"):
+        for num_workers in (1, 2, 4, 8):
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                start = time.perf_counter()
+                futures = [executor.submit(_evaluate, expr, x, policy, NUM_CALLS//num_workers)
+                           for _ in range(num_workers)]
+                for f in futures:
+                    f.result()
+                elapsed = time.perf_counter()-start
+            logger.info(f"policy={policy:6s} workers={num_workers} : {NUM_CALLS/elapsed:10.1f} calls/s")
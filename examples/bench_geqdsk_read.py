@@ -0,0 +1,63 @@
+import io
+import pathlib
+import time
+
+import numpy as np
+from spdm.common.logger import logger
+from spdm.plugins.data.file.PluginGEQdsk import sp_read_geqdsk, sp_write_geqdsk
+
+GFILE = pathlib.Path(__file__).parent/"data/g063982.04800"
+
+
+def _timeit(func, repeat=5):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = func()
+        best = min(best, time.perf_counter()-start)
+    return best, res
+
+
+def _read_per_value(text: str):
+    """ baseline: the former reader, one float() per 16-character field """
+    file = io.StringIO(text)
+    file.read(52)
+    nw = int(file.read(4))
+    nh = int(file.read(4))
+    file.readline()
+
+    def _read_data(count, width=16):
+        data = []
+        for n in range(count):
+            data.append(float(file.read(width)))
+            if n >= count - 1 or ((n + 1) % 5 == 0):
+                file.readline()
+        return np.asarray(data)
+
+    res = [_read_data(20)] + [_read_data(nw) for _ in range(4)] + [_read_data(nw*nh), _read_data(nw)]
+    nbbs = int(file.read(5))
+    limitr = int(file.read(5))
+    file.readline()
+    return res + [_read_data(nbbs*2), _read_data(limitr*2)]
+
+
+if __name__ == '__main__':
+    text = GFILE.read_text()
+    geqdsk = sp_read_geqdsk(io.StringIO(text))
+
+    cases = [(GFILE.name, text)]
+    for nw, nh in [(257, 257), (513, 513)]:
+        r = np.linspace(0.0, 1.0, nw)
+        z = np.linspace(-1.0, 1.0, nh)
+        p = dict(geqdsk, nw=nw, nh=nh, psirz=np.exp(-(r[None, :]**2+z[:, None]**2)),
+                 **{k: np.linspace(-1.0, 1.0, nw) for k in ["fpol", "pres", "ffprim", "pprim", "qpsi"]})
+        buffer = io.StringIO()
+        sp_write_geqdsk(p, buffer)
+        cases.append((f"synthetic {nw}x{nh}", buffer.getvalue()))
+
+    for name, text in cases:
+        t_read, res = _timeit(lambda: sp_read_geqdsk(io.StringIO(text)))
+        t_base, _ = _timeit(lambda: _read_per_value(text), repeat=1)
+        size = len(text)/1.0e6
+        logger.info(f"{name}: {size:.2f} MB  vectorized {t_read*1.0e3:.2f} ms ({size/t_read:.1f} MB/s, {1.0/t_read:.0f} files/s)"
+                    f" | per-value {t_base*1.0e3:.2f} ms ({size/t_base:.1f} MB/s)  speedup x{t_base/t_read:.1f}")
@@ -0,0 +1,41 @@
+import time
+
+import numpy as np
+from scipy.interpolate import RectBivariateSpline
+from spdm.common.logger import logger
+from spdm.mesh.RectilinearMesh import RectilinearMesh
+
+NUM_POINTS = 1000000
+
+
+def _timeit(func, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = func()
+        best = min(best, time.perf_counter()-start)
+    return best, res
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+
+    for nw, nh in [(129, 129), (257, 513), (513, 513)]:
+        r = np.linspace(1.0, 2.5, nw)
+        z = np.linspace(-1.0, 1.0, nh)
+        mesh = RectilinearMesh(None, r, z)
+        R, Z = mesh.xy
+        psi = np.exp(-((R-1.7)**2+Z**2)*4.0)
+
+        pr = rng.uniform(r[0], r[-1], NUM_POINTS)
+        pz = rng.uniform(z[0], z[-1], NUM_POINTS)
+
+        spl_setup, spl = _timeit(lambda: RectBivariateSpline(r, z, psi))
+
+        for dx, dy in [(0, 0), (1, 0), (1, 1)]:
+            t_spl, expected = _timeit(lambda: spl(pr, pz, dx=dx, dy=dy, grid=False))
+            t_cubic, res = _timeit(lambda: mesh.evaluate(psi, pr, pz, method="cubic", dx=dx, dy=dy))
+            t_linear, _ = _timeit(lambda: mesh.evaluate(psi, pr, pz, method="linear", dx=dx, dy=dy))
+            logger.info(f"{nw}x{nh} dx={dx} dy={dy}: RectBivariateSpline {t_spl:.3f}s (+setup {spl_setup:.3f}s)"
+                        f" | cubic {t_cubic:.3f}s  {NUM_POINTS/t_cubic/1.0e6:.2f} Mpts/s  max_err={np.max(np.abs(res-expected)):.2e}"
+                        f" | linear {t_linear:.3f}s")
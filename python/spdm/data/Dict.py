@@ -57,6 +57,7 @@ class Dict(Container, Mapping[str, _TObject]):
 
     def update(self, *args, **kwargs) -> _TDict:
         """Update the dictionary with the key/value pairs from other, overwriting existing keys. Return self.
+           Keys may be dotted paths and nested mappings are merged, all values are inserted in one pass (Entry.put_many).
 
         Args:
             d (Mapping): [description]
@@ -700,6 +700,65 @@ class Entry(object):
     def get_many(self, key_list) -> Mapping:
         return {key: self.get(key, None) for key in key_list}
 
+    def put_many(self, values: Union[Mapping, Sequence[Tuple[_TPath, Any]]], /) -> _TEntry:
+        """
+            Insert many values in one pass.
+            `values` is a nested dict and/or a mapping (or pairs) of path -> value, path is a dotted string or a list.
+            Intermediate nodes are created as plain dicts and nested mappings are merged into existing nodes,
+            values are inserted without going through child()/set_value().
+        """
+        if self._cache is None or self._cache is _not_found_ or self._cache is _undefined_:
+            self._cache = _DICT_TYPE_()
+        Entry._put_tree(Entry._require_node(self._cache, list(self._path)), values)
+        return self
+
+    def update(self, *args, **kwargs) -> _TEntry:
+        return self.put_many(_DICT_TYPE_(*args, **kwargs))
+
+    @staticmethod
+    def _require_node(target, path: list):
+        for key in path:
+            if target.__class__ is list:
+                if not isinstance(key, int) and not (isinstance(key, str) and key.lstrip("-").isdigit()):
+                    raise KeyError(f"Can not use key '{key}' for a list!")
+                key = int(key)
+                child = target[key]
+            else:
+                child = target.get(key, None)
+            if not isinstance(child, (dict, list)):
+                child = _DICT_TYPE_()
+                target[key] = child
+            target = child
+        return target
+
+    @staticmethod
+    def _put_tree(target, values) -> None:
+        nodes = {}  # dotted parent path -> node, so that each parent is resolved once
+        for path, value in (values.items() if isinstance(values, collections.abc.Mapping) else values):
+            if path.__class__ is str:
+                parent, _, key = path.rpartition(Path.SEPERATOR)
+                obj = nodes.get(parent, None)
+                if obj is None:
+                    obj = Entry._require_node(target, parent.split(Path.SEPERATOR)) if parent else target
+                    nodes[parent] = obj
+            else:
+                path = list(path) if isinstance(path, (list, tuple)) else [path]
+                key = path[-1]
+                obj = Entry._require_node(target, path[:-1])
+
+            if value.__class__ is dict or (not isinstance(value, Entry.PRIMARY_TYPE) and isinstance(value, collections.abc.Mapping)):
+                Entry._put_tree(Entry._require_node(obj, [key]), value)
+                nodes.clear()  # the merge may have replaced cached nodes below `obj`
+            elif obj.__class__ is list:
+                key = int(key)
+                if isinstance(obj[key], (dict, list)):
+                    nodes.clear()  # a node is replaced by a value
+                obj[key] = value
+            elif obj.setdefault(key, value) is not value:
+                if isinstance(obj[key], (dict, list)):
+                    nodes.clear()  # a node is replaced by a value
+                obj[key] = value
+
     def dump(self, *args, **kwargs):
         """
             convert data in cache to python native type and np.ndarray           
@@ -6,6 +6,7 @@ import numpy as np
 
 from ..mesh.Mesh import Mesh
 from ..common.logger import logger
+from .Function import _bi_ops, _rbi_ops, _uni_ops
 
 
 class Field(object):
@@ -21,9 +22,14 @@ class Field(object):
         else:
             self._array = np.asarray(value)
 
+        self._contours = {}
+
     def __array__(self):
         return np.asarray(self._array)
 
+    def __array_ufunc__(self, ufunc, method, *inputs,   **kwargs):
+        return FieldExpression(ufunc, method, *inputs, **kwargs)
+
     def __repr__(self):
         return f"<{self.__class__.__name__} unit='{ self._unit}' coordinates='{self._coordinates.__name__}'>"
 
@@ -61,12 +67,23 @@ class Field(object):
     def interpolator(self):
         return self._mesh.interpolator(self.__array__())
 
-    def __call__(self, *args, **kwargs):
+    def __call__(self, *args, method=None, **kwargs):
+        """
+            method : if it is given ('linear','cubic'), use the cached sparse interpolation operator of mesh
+        """
         if len(args) == 0:
             args = self._mesh.points
 
+        if method is not None:
+            return self._mesh.interpolate(self.__array__(), *args, method=method)
+
         if all([(isinstance(a, np.ndarray) and len(a.shape) == 1 and a.shape[0] == self.shape[idx]) for idx, a in enumerate(args)]):
             kwargs.setdefault("grid", True)
+        elif len(args) > 1 and all([(isinstance(a, np.ndarray) and a.ndim == len(args) and a.size == a.shape[idx])
+                                    for idx, a in enumerate(args)]):
+            # sparse (open) grid, e.g. meshgrid(...,sparse=True): evaluate on the grid without densifying
+            args = [a.ravel() for a in args]
+            kwargs.setdefault("grid", True)
         else:
             kwargs.setdefault("grid", False)
 
@@ -103,11 +120,118 @@ class Field(object):
     #     value = scipy.integrate.cumtrapz(self.value[::-1], self.axis[::-1], initial=0.0)[::-1]
     #     return Quantity(value, axis=self.axis)
 
+    def find_critical_points(self):
+        """
+            yield (x, y, value, det(Hessian)) of critical points (O-/X-points)
+        """
+        yield from self._mesh.find_critical_points(self.__array__())
+
+    def contours(self, levels, /, center=None) -> Mesh:
+        """
+            Closed contours around `center` (default: magnetic axis) for many levels,
+            packed as CurvilinearMesh, cached per levels
+        """
+        levels = np.asarray(levels, dtype=float)
+        key = (levels.tobytes(), None if center is None else tuple(center))
+        mesh = self._contours.get(key, None)
+        if mesh is None:
+            mesh = self._contours[key] = self._mesh.contours(self.__array__(), levels, center=center)
+        return mesh
+
     def plot(self, axis, *args, linewidths=0.1, **kwargs):
-        axis.contour(*self._mesh.xy,  self.__array__(),
+        axis.contour(*np.broadcast_arrays(*self._mesh.points),  self.__array__(),
                      linewidths=linewidths, **kwargs)
         return axis
 
+
+for name, op in _uni_ops.items():
+    setattr(Field,  name, lambda s, _op=op: _op(s))
+
+for name, op in _bi_ops.items():
+    setattr(Field,  name, lambda s, other, _op=op: _op(s, other))
+
+for name, op in _rbi_ops.items():
+    setattr(Field,  name, lambda s, other, _op=op: _op(other, s))
+
+
+class FieldExpression(Field):
+    """
+        Lazy ufunc expression over fields, e.g. `a*b+c`.
+
+        The tree is evaluated on the mesh of the first Field operand into one output buffer: the first
+        sub-expression of each node is computed in place in its parent's buffer, other sub-expressions
+        borrow scratch buffers from a pool that is recycled across the tree. Operands on the same mesh
+        are used as views, operands on another mesh are interpolated onto it.
+        Evaluation at points, `expr(x,y)`, evaluates the operands at the points only.
+    """
+
+    def __init__(self, ufunc, method, *inputs, **kwargs) -> None:
+        if method != "__call__":
+            raise NotImplementedError(f"ufunc method '{method}'")
+        mesh = next((d.mesh for d in inputs if isinstance(d, Field)), None)
+        if mesh is None:
+            raise TypeError(f"No Field in operands of {ufunc.__name__}")
+        self._mesh = mesh
+        self._ufunc = ufunc
+        self._inputs = inputs
+        self._kwargs = kwargs
+        self._contours = {}
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} op='{self._ufunc.__name__}' > {[repr(a) for a in self._inputs]} </ {self.__class__.__name__}>"
+
+    def __array__(self) -> np.ndarray:
+        return self._array
+
+    @cached_property
+    def _dtype(self) -> np.dtype:
+        """ dtype of the result, resolved by the ufunc on one-element probes of the operands """
+        def probe(d):
+            if not isinstance(d, Field):
+                return d
+            elif isinstance(d, FieldExpression) and "_array" not in d.__dict__:
+                return np.zeros(1, dtype=d._dtype)
+            else:
+                return np.zeros(1, dtype=np.asarray(d).dtype)
+
+        with np.errstate(all="ignore"):
+            return np.asarray(self._ufunc(*[probe(d) for d in self._inputs], **self._kwargs)).dtype
+
+    @cached_property
+    def _array(self) -> np.ndarray:
+        return self._evaluate(np.empty(self._mesh.shape, dtype=self._dtype), collections.defaultdict(list))
+
+    def _evaluate(self, out: np.ndarray, pool: Mapping[np.dtype, list]) -> np.ndarray:
+        """ evaluate into `out`, `pool`: free scratch buffers with the shape of `out`, per dtype """
+        in_place = False
+        scratch = []
+        args = []
+        for d in self._inputs:
+            if isinstance(d, FieldExpression) and "_array" not in d.__dict__ and d._mesh is self._mesh:
+                if not in_place and d._dtype == out.dtype:
+                    buf = out
+                    in_place = True
+                else:
+                    free = pool[d._dtype]
+                    buf = free.pop() if len(free) > 0 else np.empty(out.shape, dtype=d._dtype)
+                    scratch.append(buf)
+                args.append(d._evaluate(buf, pool))
+            elif isinstance(d, Field):
+                args.append(np.asarray(d) if d.mesh is self._mesh else np.asarray(d(*self._mesh.points)))
+            else:
+                args.append(d)
+
+        res = self._ufunc(*args, out=out, **self._kwargs)
+        for buf in scratch:
+            pool[buf.dtype].append(buf)
+        return res
+
+    def __call__(self, *args, **kwargs):
+        if len(args) == 0 and len(kwargs) == 0:
+            return self.__array__()
+        return self._ufunc(*[(d(*args, **kwargs) if isinstance(d, Field) else d) for d in self._inputs], **self._kwargs)
+
+
 # def derivative_n(self, n, *args, **kwargs):
 #     self.evaluate()
 #     return Quantity(self.as_function.derivative(n=n)(self._coordinates), axis=self._coordinates)
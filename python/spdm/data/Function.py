@@ -1,11 +1,15 @@
 import collections
 import collections.abc
+import contextlib
+import contextvars
 import functools
 import inspect
 import operator
-import warnings
+import weakref
+from concurrent.futures import Executor
 from functools import cached_property
-from typing import Any, Callable, Optional, Sequence, Set, Type, Union
+from typing import (Any, Callable, Iterator, Mapping, Optional, Sequence, Set,
+                    Type, TypeVar, Union)
 
 import numpy as np
 from scipy.interpolate import CubicSpline, PPoly
@@ -13,12 +17,63 @@ from spdm.common.logger import logger
 from spdm.util.misc import array_like
 
 from ..common.logger import logger
-from ..util.misc import float_unique
+from ..util.misc import float_unique, intern_axis, merge_axis
 from ..common.tags import _undefined_
 from .Entry import Entry, EntryCombiner
 from .Node import Node
 
 
+_NUMERIC_POLICIES = ("raise", "warn", "ignore", "record")
+
+_numeric_policy = contextvars.ContextVar("spdm_numeric_policy", default=("raise", None))
+
+
+@contextlib.contextmanager
+def numeric_policy(policy: str = "raise"):
+    """
+        Set the policy for floating-point errors (divide, overflow, invalid) raised while evaluating
+        an `Expression`. Underflow is ignored, as numpy does by default.
+
+            raise  : raise RuntimeError (default)
+            warn   : emit RuntimeWarning and continue
+            ignore : silently continue
+            record : silently continue, and append (expression, mask of non-finite values)
+                     to the list returned by the context manager
+
+        The policy is stored in a context variable, so it is local to the current thread
+        (or asyncio task).  Threads started inside the context use the default policy
+        unless they enter their own `numeric_policy`.
+    """
+    if policy not in _NUMERIC_POLICIES:
+        raise ValueError(f"Illegal numeric policy '{policy}', should be one of {_NUMERIC_POLICIES}")
+    record = [] if policy == "record" else None
+    token = _numeric_policy.set((policy, record))
+    try:
+        yield record
+    finally:
+        _numeric_policy.reset(token)
+
+
+def _numeric_errstate(policy: str) -> np.errstate:
+    """ np.errstate of the numeric policy, underflow is ignored (as numpy does by default) """
+    mode = "ignore" if policy == "record" else policy
+    return np.errstate(divide=mode, over=mode, invalid=mode, under="ignore")
+
+
+def _evaluate_with_policy(name: str, func: Callable, *args) -> np.ndarray:
+    """ func(*args) under the numeric policy of the current context, see `numeric_policy` """
+    policy, _ = _numeric_policy.get()
+    try:
+        with _numeric_errstate(policy):
+            return func(*args)
+    except FloatingPointError as error:
+        logger.error(f"{name}: {error}")
+        raise RuntimeError(error) from error
+
+
+_TFunctionBundle = TypeVar("_TFunctionBundle", bound="FunctionBundle")
+
+
 def create_spline(x, y, **kwargs) -> PPoly:
     bc_type = "periodic" if np.all(y[0] == y[-1]) else "not-a-knot"
     try:
@@ -29,12 +84,68 @@ def create_spline(x, y, **kwargs) -> PPoly:
     return res
 
 
+def adaptive_axis(func: Callable, x_min: float, x_max: float, num: int, /,
+                  tolerance: float = None, candidate: np.ndarray = None) -> np.ndarray:
+    r"""
+        Build an axis of at most `num` points on [x_min,x_max], which is dense where `func` bends
+        and sparse where it is smooth.
+
+        The points equidistribute the density :math:`\sqrt{|f''|}` (plus a uniform floor, so that
+        flat regions are not left empty), which is the optimal point density for piecewise linear
+        interpolation. If `tolerance` is given, the smallest axis (<= num points) whose spline
+        reproduces `func` on the candidate grid within `tolerance` (max abs error) is returned.
+
+        candidate : reference grid used to sample `func`, default is the union of the original
+                    axis and a uniform grid finer than `num`.
+    """
+    if num < 2:
+        raise ValueError(f"Point budget is too small! num={num}")
+
+    ref = np.linspace(x_min, x_max, max(4*num, 128))
+    if candidate is not None:
+        ref = float_unique(np.hstack([ref, candidate]), x_min, x_max)
+
+    y = np.asarray(func(ref))
+
+    d2 = np.sqrt(np.abs(create_spline(ref, y).derivative(2)(ref)))
+    density = d2 + 0.1*np.mean(d2)
+    cdf = np.append(0.0, np.cumsum(0.5*(density[1:]+density[:-1])*np.diff(ref)))
+
+    def _axis(n):
+        if not cdf[-1] > 0:
+            return np.linspace(x_min, x_max, n)
+        axis = np.interp(np.linspace(0, cdf[-1], n), cdf, ref)
+        axis[0] = x_min
+        axis[-1] = x_max
+        return float_unique(axis, x_min, x_max)
+
+    if tolerance is None:
+        return _axis(num)
+
+    n_min, n_max = 4, num
+    axis = _axis(n_max)
+    while n_min < n_max:
+        n = (n_min+n_max)//2
+        trial = _axis(n)
+        if np.max(np.abs(create_spline(trial, np.asarray(func(trial)))(ref)-y)) <= tolerance:
+            axis = trial
+            n_max = n
+        else:
+            n_min = n+1
+    if len(axis) > n_max:
+        axis = _axis(n_max)
+    return axis
+
+
 class Function:
     """
         NOTE: Function is immutable!!!!
     """
 
-    def __init__(self, x: Union[np.ndarray, Sequence] = None, y: Union[np.ndarray, float, Callable] = _undefined_, /, **kwargs):
+    def __init__(self, x: Union[np.ndarray, Sequence] = None, y: Union[np.ndarray, float, Callable] = _undefined_, /, dtype=None, **kwargs):
+        """
+            dtype : storage type of y (e.g. np.float32), evaluation is always done in float64
+        """
         if y is _undefined_:
             y = x
             x = None
@@ -64,7 +175,7 @@ class Function:
         elif isinstance(x, np.ndarray):
             if len(x) == 0:
                 logger.error(f"{type(x)} {type(y)}")
-            self._x_axis = x
+            self._x_axis = intern_axis(x)
             self._x_domain = [x[0], x[-1]]
         elif isinstance(x, collections.abc.Sequence) and len(x) > 0:
             self._x_domain = list(set(x))
@@ -80,6 +191,9 @@ class Function:
         if isinstance(self._y, np.ndarray) and (self._x_axis is None or self._x_axis.shape != self._y.shape):
             raise ValueError(f"x.shape  != y.shape {x.shape}!={y.shape}")
 
+        if dtype is not None and isinstance(self._y, np.ndarray):
+            self._y = self._y.astype(dtype, copy=False)
+
     @property
     def is_valid(self) -> bool:
         return self._x_axis is not None and self._y is not None
@@ -134,6 +248,11 @@ class Function:
     def __array__(self) -> np.ndarray:
         return self._y if isinstance(self._y, np.ndarray) else np.asarray(self.__call__())
 
+    def _reset_cache(self) -> None:
+        """ drop the values cached from y, after y is changed in place """
+        for k in ("_ppoly", "is_periodic"):
+            self.__dict__.pop(k, None)
+
     @cached_property
     def _ppoly(self) -> PPoly:
 
@@ -153,7 +272,10 @@ class Function:
         if x is None:
             raise RuntimeError(f"x_axis is None!")
 
-        if x is self._x_axis and isinstance(self._y, np.ndarray):
+        if isinstance(self._y, np.ndarray) and (x is self._x_axis or (
+                isinstance(x, np.ndarray) and x.shape == self._x_axis.shape and np.array_equal(x, self._x_axis))):
+            if self._y.dtype.kind == 'f' and self._y.dtype.itemsize < 8:
+                return self._y.astype(float)
             return self._y
 
         if self._y is None:
@@ -173,11 +295,22 @@ class Function:
         else:
             raise TypeError((type(x), type(self._y)))
 
-    def resample(self, x_min, x_max=None, /, **kwargs):
-        if x_min is None or (x_max is not None and x_min <= self.x_min and self.x_max <= x_max):
+    def resample(self, x_min, x_max=None, /, num: int = None, tolerance: float = None, **kwargs):
+        """
+            num       : point budget. If it is given, points are inserted in rapidly changing places
+                        and removed where the function is smooth,  see `adaptive_axis`.
+            tolerance : with `num`, return the smallest axis which keeps the max abs error below `tolerance`.
+        """
+        if num is not None and not isinstance(x_min, np.ndarray):
+            x_min = self.x_min if x_min is None else max(self.x_min, x_min)
+            x_max = self.x_max if x_max is None else min(self.x_max, x_max)
+            if not np.isfinite(x_min) or not np.isfinite(x_max):
+                raise ValueError(f"Can not resample on unbounded domain {x_min,x_max}")
+            x_axis = adaptive_axis(self, x_min, x_max, num, tolerance=tolerance, candidate=self.x_axis)
+            return Function(x_axis, np.asarray(self.__call__(x_axis)))
+        elif x_min is None or (x_max is not None and x_min <= self.x_min and self.x_max <= x_max):
             if len(kwargs) > 0:
                 logger.warning(f"ignore key-value arguments {kwargs.keys()}")
-                # TODO: Insert points in rapidly changing places.
             return self
         elif x_max is None:
             return Function(x_min, self.__call__(x_min, **kwargs))
@@ -193,7 +326,7 @@ class Function:
             if idx_max > idx_min:
                 pass
             elif idx_max == 0 and np.isclose(self.x_axis[-1], x_max):
-                idx_max = -1
+                idx_max = len(self.x_axis)
             else:
                 logger.debug((x_min, x_max, idx_min, idx_max, self.x_axis))
             if isinstance(self._y, np.ndarray):
@@ -360,7 +493,7 @@ _bi_ops = {
     "__ne__": np.not_equal,
     "__lt__": np.less,
     "__le__": np.less_equal,
-    "__gt__": np.greater_equal,
+    "__gt__": np.greater,
     "__ge__": np.greater_equal,
 }
 
@@ -386,6 +519,87 @@ for name, op in _rbi_ops.items():
     setattr(Function,  name, lambda s, other, _op=op: _op(other, s))
 
 
+class FunctionBundle:
+    """
+        Many functions on one shared x axis,  stored as the rows of one contiguous 2-D buffer.
+
+        Items are `Function` objects whose y is a row view of the buffer (no copy). The buffer may be
+        stored in a compact dtype (e.g. np.float32), while evaluation is done in float64.
+        Writing the buffer through `__setitem__` resets the caches (spline) of the items already returned.
+    """
+
+    def __init__(self, x: np.ndarray, y: Union[np.ndarray, int] = 0, /, dtype=float) -> None:
+        """
+            x : shared x axis
+            y : 2-D array [num_of_functions, len(x)], or the number of (zero) functions
+        """
+        self._x_axis = intern_axis(np.asarray(x))
+        if isinstance(y, int):
+            self._data = np.zeros([y, len(self._x_axis)], dtype=dtype)
+        else:
+            self._data = np.ascontiguousarray(y, dtype=dtype)
+
+        if self._data.ndim != 2 or self._data.shape[1] != len(self._x_axis):
+            raise ValueError(f"y.shape should be [n,{len(self._x_axis)}] not {self._data.shape}")
+
+        self._items = weakref.WeakSet()  # items returned by __getitem__, shared by the views of this buffer
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} num={len(self)} dtype={self.dtype} />"
+
+    @property
+    def x_axis(self) -> np.ndarray:
+        return self._x_axis
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def __len__(self) -> int:
+        return self._data.shape[0]
+
+    def __array__(self) -> np.ndarray:
+        return self._data
+
+    def __getitem__(self, idx) -> Union[Function, _TFunctionBundle]:
+        if isinstance(idx, (int, np.integer)):
+            res = Function(self._x_axis, self._data[idx])
+            self._items.add(res)
+        else:
+            res = FunctionBundle(self._x_axis, self._data[idx], dtype=self.dtype)
+            res._items = self._items
+        return res
+
+    def __setitem__(self, idx, value) -> None:
+        if isinstance(value, Function):
+            value = value(self._x_axis)
+        self._data[idx] = value
+        for item in list(self._items):
+            item._reset_cache()
+
+    def __iter__(self) -> Iterator[Function]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def resample(self, x_min, x_max, /) -> _TFunctionBundle:
+        """
+            Return a bundle restricted to the axis points in [x_min,x_max]. The result is a view of this buffer.
+        """
+        idx_min = np.searchsorted(self._x_axis, x_min, side="left")
+        idx_max = np.searchsorted(self._x_axis, x_max, side="right")
+        if idx_max-idx_min < 2:
+            raise ValueError(f"{x_min,x_max}  not in  {self._x_axis[0],self._x_axis[-1]}")
+        res = object.__new__(FunctionBundle)
+        res._x_axis = self._x_axis[idx_min:idx_max]
+        res._data = self._data[:, idx_min:idx_max]
+        res._items = self._items
+        return res
+
+
 class PiecewiseFunction(Function):
     def __init__(self, x, y, *args,    **kwargs) -> None:
         super().__init__(x, y, *args,    **kwargs)
@@ -485,59 +699,112 @@ class Expression(Function):
     @cached_property
     def x_axis(self) -> np.ndarray:
         axis = None
-        is_changed = False
         for f in self._y:
             if not isinstance(f, Function) or f.x_axis is None or axis is f.x_axis:
                 continue
             elif axis is None:
                 axis = f.x_axis
             else:
-                axis = np.hstack([axis, f.x_axis])
-                is_changed = True
-
-        if is_changed:
-            axis = float_unique(axis, self.x_min, self.x_max)
+                axis = merge_axis(axis, f.x_axis, self.x_min, self.x_max)
         return axis
 
-    def resample(self, x_min, x_max=None, /, **kwargs):
+    def resample(self, x_min, x_max=None, /, num: int = None, **kwargs):
+        if num is not None:
+            return super().resample(x_min, x_max, num=num, **kwargs)
         inputs = [(f.resample(x_min, x_max, **kwargs)
                    if isinstance(f, Function) else f) for f in self._y]
         return Expression(self._ufunc, self._method, *inputs, **self._kwargs)
 
-    def __call__(self, x: Optional[Union[float, np.ndarray]] = None, *args, **kwargs) -> np.ndarray:
-
+    def __call__(self, x: Optional[Union[float, np.ndarray]] = None, *args, executor: Executor = None, **kwargs) -> np.ndarray:
+        """
+            executor : if it is given, independent operands (sub-trees) are evaluated concurrently, see `evaluate_parallel`
+        """
         if x is None or (isinstance(x, list) and len(x) == 0):
             x = self.x_axis
 
         if x is None:
             raise RuntimeError(f"Can not get x_axis!")
 
-        def wrap(x, d):
-            if d is None:
-                res = 0
-            elif isinstance(d, Function):
-                res = np.asarray(d(x))
-            elif not isinstance(d, np.ndarray) or len(d.shape) == 0:
-                res = d
-            elif self.x_axis is not None and d.shape == self.x_axis.shape:
-                res = np.asarray(Function(self.x_axis, d)(x))
-            elif d.shape == x.shape:
-                res = d
+        if executor is not None:
+            return evaluate_parallel(self, x, executor)
+        else:
+            return self._apply(x)
+
+    def _wrap(self, x, d):
+        if d is None:
+            res = 0
+        elif isinstance(d, Function):
+            res = np.asarray(d(x))
+        elif not isinstance(d, np.ndarray) or len(d.shape) == 0:
+            res = d
+        elif self.x_axis is not None and d.shape == self.x_axis.shape:
+            res = np.asarray(Function(self.x_axis, d)(x))
+        elif d.shape == x.shape:
+            res = d
+        else:
+            raise ValueError(
+                f"{getattr(self.x_axis,'shape',[])} {x.shape} {type(d)} {d.shape}")
+        return res
+
+    def _apply(self, x, values: Mapping = None) -> np.ndarray:
+        """
+            values : evaluated operands, {id(operand):value}. Operands not in `values` are evaluated here.
+        """
+        def operands():
+            if values is None:
+                return [self._wrap(x, d) for d in self._y]
             else:
-                raise ValueError(
-                    f"{getattr(self.x_axis,'shape',[])} {x.shape} {type(d)} {d.shape}")
-            return res
-
-        with warnings.catch_warnings():
-            warnings.filterwarnings("error")
-            try:
-                res = self._ufunc(*[wrap(x, d) for d in self._y])
-            except RuntimeWarning as warning:
-                logger.error((self._ufunc, [wrap(x, d) for d in self._y]))
-                logger.exception(warning)
-                raise RuntimeError(warning)
+                return [values[id(d)] if id(d) in values else self._wrap(x, d) for d in self._y]
+
+        res = _evaluate_with_policy(self._ufunc.__name__, lambda: self._ufunc(*operands()))
+
+        policy, record = _numeric_policy.get()
+        if policy == "record":
+            mask = ~np.isfinite(res)
+            if np.any(mask):
+                record.append((self, mask))
         return res
 
         # if self._method != "__call__":
         #     op = getattr(self._ufunc, self._method)
         #     res = op(*[wrap(x, d) for d in self._y])
+
+
+def evaluate_parallel(expr: Expression, x: np.ndarray, executor: Executor) -> np.ndarray:
+    """
+        Evaluate `expr` at `x`, scheduling independent sub-trees on `executor` (e.g. ThreadPoolExecutor).
+
+        Nodes are grouped by height in the expression tree: all leaves (splines, callables) are evaluated
+        concurrently first, then each level of `Expression` nodes, whose operands are all done. An operand
+        shared by several nodes is evaluated once. The numeric policy of the caller is applied in the workers.
+    """
+    heights = {}
+
+    def visit(f) -> int:
+        item = heights.get(id(f), None)
+        if item is not None:
+            return item[1]
+        if isinstance(f, Expression):
+            h = 1+max([visit(d) for d in f._y if isinstance(d, Function)], default=-1)
+        else:
+            h = 0
+        heights[id(f)] = (f, h)
+        return h
+
+    visit(expr)
+
+    levels = collections.defaultdict(list)
+    for f, h in heights.values():
+        levels[h].append(f)
+
+    values = {}
+    for h in sorted(levels.keys()):
+        nodes = levels[h]
+        if h == 0:
+            futures = [executor.submit(contextvars.copy_context().run, _evaluate_with_policy,
+                                       f.__class__.__name__, lambda f: np.asarray(f(x)), f) for f in nodes]
+        else:
+            futures = [executor.submit(contextvars.copy_context().run, f._apply, x, values) for f in nodes]
+        values.update({id(f): future.result() for f, future in zip(nodes, futures)})
+
+    return values[id(expr)]
@@ -1,11 +1,131 @@
+import collections
+from functools import cached_property
+from typing import Sequence, Tuple, Union
 
+import numpy as np
+from scipy import sparse
+from scipy.interpolate import BSpline, make_interp_spline
 
 from ..data.Function import Function
 from ..common.logger import logger
 from .Surface import Surface
 
 
+def _basis_values(t: np.ndarray, k: int, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Non-zero B-spline basis functions at points `x` (Cox-de Boor, vectorized over points).
+        Return: span, N  ,  N[:,r] is the value of basis function span-k+r, shape=[len(x), k+1]
+    """
+    n = len(t)-k-1
+    span = np.clip(np.searchsorted(t, x, side="right")-1, k, n-1)
+    N = np.zeros([len(x), k+1])
+    N[:, 0] = 1.0
+    left = np.zeros([len(x), k+1])
+    right = np.zeros([len(x), k+1])
+    for j in range(1, k+1):
+        left[:, j] = x-t[span+1-j]
+        right[:, j] = t[span+j]-x
+        saved = np.zeros(len(x))
+        for r in range(j):
+            temp = N[:, r]/(right[:, r+1]+left[:, j-r])
+            N[:, r] = saved+right[:, r+1]*temp
+            saved = left[:, j-r]*temp
+        N[:, j] = saved
+    return span, N
+
+
 class BSplineSurface(Surface):
-    def __init__(self, *args, **kwargs) -> None:
-        super().__init__(*args, **kwargs)
-        raise NotImplementedError()
+    """
+        Tensor-product B-spline surface interpolating `points` on the grid `uv`.
+
+        points   : shape=[len(u), len(v), ndims]
+        is_closed: periodic in u and/or v, bool or [bool, bool], default is detected from the points
+
+        Coefficients are fitted axis by axis (make_interp_spline on all columns at once).
+        Grid evaluation uses the separable basis matrices:  X = B_u @ C @ B_v^T , the matrices are cached per
+        evaluation axis with LRU eviction. Scattered points use vectorized de Boor on the (k+1)x(k+1) local support.
+    """
+    BASIS_CACHE_SIZE = 16
+
+    def __init__(self, points: np.ndarray, uv: Sequence[np.ndarray] = None, /, is_closed: Union[bool, Sequence[bool]] = None, order: int = 3, **kwargs) -> None:
+        super().__init__(points, uv, **kwargs)
+        if self.rank != 2 or self._points.ndim != 3:
+            raise ValueError(f"points should be [len(u), len(v), ndims], not {self._points.shape}")
+
+        if is_closed is None:
+            is_closed = [np.allclose(self._points[0], self._points[-1]), np.allclose(self._points[:, 0], self._points[:, -1])]
+        elif not isinstance(is_closed, collections.abc.Sequence):
+            is_closed = [is_closed]*2
+        self._cycle = [bool(c) for c in is_closed]
+        self._order = [min(order, n-1) for n in self._points.shape[:2]]
+        self._basis_cache = collections.OrderedDict()
+
+    @property
+    def is_closed(self) -> Sequence[bool]:
+        return self._cycle
+
+    @cached_property
+    def _spl(self) -> Tuple[Sequence[np.ndarray], np.ndarray]:
+        """ knots (t_u, t_v) and coefficients, shape=[n_u, n_v, ndims] """
+        knots = []
+        c = self._points
+        for axis, (x, k, cycle) in enumerate(zip(self._mesh, self._order, self._cycle)):
+            spl = make_interp_spline(x, c, k=k, axis=axis, bc_type="periodic" if cycle else None)
+            knots.append(spl.t)
+            c = np.moveaxis(spl.c, 0, axis)
+        return knots, c
+
+    def _normalize(self, axis: int, x: np.ndarray) -> np.ndarray:
+        d = self._mesh[axis]
+        if self._cycle[axis]:
+            return d[0]+np.mod(x-d[0], d[-1]-d[0])
+        else:
+            return np.clip(x, d[0], d[-1])
+
+    def basis_matrix(self, axis: int, x: np.ndarray) -> sparse.csr_matrix:
+        """ B-spline collocation matrix of `axis` at `x`, shape=[len(x), num_of_coefficients], cached """
+        x = np.asarray(x, dtype=float)
+        key = (axis, x.shape, hash(x.tobytes()))
+        mat = self._basis_cache.get(key, None)
+        if mat is not None:
+            self._basis_cache.move_to_end(key)
+            return mat
+        knots, _ = self._spl
+        mat = BSpline.design_matrix(self._normalize(axis, x.ravel()), knots[axis], self._order[axis],
+                                    extrapolate="periodic" if self._cycle[axis] else False).tocsr()
+        self._basis_cache[key] = mat
+        while len(self._basis_cache) > BSplineSurface.BASIS_CACHE_SIZE:
+            self._basis_cache.popitem(last=False)
+        return mat
+
+    def points(self, *uv: np.ndarray, grid: bool = True) -> np.ndarray:
+        """
+            grid=True : points on the grid u x v,  shape=[len(u), len(v), ndims]
+            grid=False: points at scattered (u,v), shape=[*broadcast(u,v).shape, ndims]
+        """
+        if len(uv) == 0:
+            return self._points
+        elif len(uv) != 2:
+            raise ValueError(f"Need (u,v), not {len(uv)} arguments")
+
+        knots, c = self._spl
+        nu, nv, ndims = c.shape
+        if grid:
+            u, v = [np.asarray(d, dtype=float).ravel() for d in uv]
+            bu = self.basis_matrix(0, u)
+            bv = self.basis_matrix(1, v)
+            tmp = (bu @ c.reshape(nu, nv*ndims)).reshape(len(u), nv, ndims)
+            return np.stack([(bv @ tmp[..., d].T).T for d in range(ndims)], axis=-1)
+
+        u, v = np.broadcast_arrays(*[np.asarray(d, dtype=float) for d in uv])
+        shape = u.shape
+        ku, kv = self._order
+        iu, Nu = _basis_values(knots[0], ku, self._normalize(0, u.ravel()))
+        iv, Nv = _basis_values(knots[1], kv, self._normalize(1, v.ravel()))
+        cu = (iu-ku)[:, None]+np.arange(ku+1)
+        cv = (iv-kv)[:, None]+np.arange(kv+1)
+        local = c[cu[:, :, None], cv[:, None, :]]
+        return np.einsum("na,nb,nabd->nd", Nu, Nv, local).reshape(*shape, ndims)
+
+    def __call__(self, *uv, **kwargs) -> np.ndarray:
+        return self.points(*uv, **kwargs)
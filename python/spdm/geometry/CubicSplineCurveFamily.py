@@ -0,0 +1,132 @@
+import collections.abc
+from functools import cached_property
+from typing import Sequence, Union
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+from ..common.logger import logger
+from .CubicSplineCurve import CubicSplineCurve
+from .Curve import _chord_length, _inverse_arc_length
+
+
+class CubicSplineCurveFamily(collections.abc.Sequence):
+    """
+        A family of curves (e.g. flux surfaces) sharing one parameterization u.
+
+        Control points of all curves are packed in one array, shape=[num_of_curves, len(u), ndims], and
+        fitted as one multi-column cubic spline (periodic if all curves are closed). Points, derivatives,
+        `dl` and `length` of all curves are evaluated in one call. Items are CubicSplineCurve.
+    """
+
+    def __init__(self, points: np.ndarray, u: np.ndarray = None, /, is_closed: bool = None) -> None:
+        points = np.asarray(points, dtype=float)
+        if points.ndim != 3:
+            raise ValueError(f"points should be [num_of_curves, num_of_points, ndims], not {points.shape}")
+        self._points = points
+        self._u = np.linspace(0, 1, points.shape[1]) if u is None else np.asarray(u, dtype=float)
+        if len(self._u) != points.shape[1]:
+            raise ValueError(f"{len(self._u)} != {points.shape[1]}")
+        self._is_closed = bool(np.allclose(points[:, 0], points[:, -1])) if is_closed is None else is_closed
+
+    @classmethod
+    def from_curves(cls, curves: Sequence[CubicSplineCurve], u: Union[np.ndarray, int] = None):
+        """ pack curves, resampled on the shared parameterization `u` (default: the mesh of the first curve) """
+        if isinstance(u, int):
+            u = np.linspace(0, 1, u)
+        elif u is None:
+            u = curves[0].mesh[0]
+        return cls(np.stack([c.points(u) for c in curves]), u)
+
+    def __len__(self) -> int:
+        return self._points.shape[0]
+
+    def __getitem__(self, idx) -> Union[CubicSplineCurve, "CubicSplineCurveFamily"]:
+        if isinstance(idx, slice):
+            return CubicSplineCurveFamily(self._points[idx], self._u, is_closed=self._is_closed)
+        return CubicSplineCurve(self._points[idx], [self._u])
+
+    @property
+    def u(self) -> np.ndarray:
+        return self._u
+
+    @property
+    def ndims(self) -> int:
+        return self._points.shape[-1]
+
+    @property
+    def is_closed(self) -> bool:
+        return self._is_closed
+
+    @cached_property
+    def _spl(self) -> CubicSpline:
+        m, n, d = self._points.shape
+        return CubicSpline(self._u, self._points.transpose(1, 0, 2).reshape(n, m*d),
+                           bc_type="periodic" if self._is_closed else "not-a-knot")
+
+    @cached_property
+    def _derivative(self):
+        return self._spl.derivative()
+
+    def _unpack(self, res: np.ndarray) -> np.ndarray:
+        return res.reshape(res.shape[0], len(self), self.ndims).transpose(1, 0, 2)
+
+    def points(self, *args) -> np.ndarray:
+        """ points of all curves, shape=[num_of_curves, len(u), ndims] """
+        if len(args) == 0:
+            return self._points
+        return self._unpack(self._spl(np.asarray(args[0], dtype=float).ravel()))
+
+    def derivative(self, *args) -> np.ndarray:
+        """ dx/du of all curves, shape=[num_of_curves, len(u), ndims] """
+        u = self._u if len(args) == 0 else np.asarray(args[0], dtype=float).ravel()
+        return self._unpack(self._derivative(u))
+
+    @cached_property
+    def dl(self) -> np.ndarray:
+        """ arc length of the segments between nodes of u, shape=[num_of_curves, len(u)-1], see Curve.dl """
+        x, y = np.moveaxis(self._points, -1, 0)
+        a, b = np.moveaxis(self.derivative(), -1, 0)
+        return _chord_length(x, y, a, b)
+
+    @cached_property
+    def length(self) -> np.ndarray:
+        """ shape=[num_of_curves] """
+        return np.sum(self.dl, axis=-1)
+
+    @cached_property
+    def arc_length(self) -> np.ndarray:
+        """ cumulative arc length at the nodes of u, shape=[num_of_curves, len(u)] """
+        return np.concatenate([np.zeros([len(self), 1]), np.cumsum(self.dl, axis=-1)], axis=-1)
+
+    def inverse_arc_length(self, s: np.ndarray) -> np.ndarray:
+        """ parameter u at arc length `s` (shape=[num_of_curves, k]) of each curve, see Curve.inverse_arc_length """
+        s = np.asarray(s, dtype=float)
+        g = 1.0/np.linalg.norm(self.derivative(), axis=-1)
+        return _inverse_arc_length(self.arc_length, self._u, g, s)
+
+    def points_at(self, u: np.ndarray) -> np.ndarray:
+        """
+            points of curve i at its own parameters u[i], u.shape=[num_of_curves, k], return shape=[num_of_curves, k, ndims]
+            The coefficients of the packed spline are gathered per (curve, segment), no loop over curves.
+        """
+        u = np.asarray(u, dtype=float)
+        spl = self._spl
+        seg = np.clip(np.searchsorted(spl.x, u, side="right")-1, 0, len(spl.x)-2)
+        cols = np.arange(len(self))[:, None]*self.ndims + np.arange(self.ndims)
+        c = spl.c[:, seg[..., None], cols[:, None, :]]
+        dx = (u-spl.x[seg])[..., None]
+        res = c[0]
+        for p in range(1, c.shape[0]):
+            res = res*dx + c[p]
+        return res
+
+    def remesh(self, num: int = None, /) -> "CubicSplineCurveFamily":
+        """
+            resample all curves with `num` points equally spaced in arc length, as one array operation.
+            The new shared parameter u is the normalized arc length.
+        """
+        num = num or len(self._u)
+        t = np.linspace(0.0, 1.0, num)
+        u = self.inverse_arc_length(self.length[:, None]*t)
+        return CubicSplineCurveFamily(self.points_at(u), t, is_closed=self._is_closed)
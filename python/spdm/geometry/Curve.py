@@ -1,5 +1,5 @@
 from functools import cached_property
-from typing import Callable, TypeVar, Tuple
+from typing import Callable, TypeVar, Tuple, Union
 
 import numpy as np
 
@@ -29,31 +29,58 @@ class Curve(GeoObject):
         super().__init__(*args, **kwargs)
 
     def points(self, *args, **kwargs):
-        return super().points(*args, **kwargs)
+        """ vertices, or points of the polyline (piecewise linear in u) at `u` """
+        if len(args) == 0 or not isinstance(self._mesh, list):
+            return super().points(*args, **kwargs)
+        u = np.asarray(args[0], dtype=float)
+        return np.stack([np.interp(u, self._mesh[0], d) for d in self.xyz], axis=-1)
 
     @cached_property
     def dl(self) -> np.ndarray:
         x, y = np.moveaxis(self.points(), -1, 0)
 
-        a, b = self.derivative()
+        d = self.derivative()
+        if d is NotImplemented:
+            return np.hypot(x[1:]-x[:-1], y[1:]-y[:-1])
+        a, b = d
+        return _chord_length(x, y, a, b)
 
-        # a = a[:-1]
-        # b = b[:-1]
-        dx = x[1:]-x[:-1]
-        dy = y[1:]-y[:-1]
-
-        m1 = (-a[:-1]*dy+b[:-1]*dx)/(a[:-1]*dx+b[:-1]*dy)
+    @cached_property
+    def length(self):
+        return np.sum(self.dl)
 
-        # a = np.roll(a, 1, axis=0)
-        # b = np.roll(b, 1, axis=0)
+    @cached_property
+    def arc_length(self) -> np.ndarray:
+        """ cumulative arc length at the vertices, shape=[num_of_vertices] """
+        return np.concatenate([[0.0], np.cumsum(self.dl)])
 
-        m2 = (-a[1:]*dy+b[1:]*dx)/(a[1:]*dx+b[1:]*dy)
+    def inverse_arc_length(self, s: np.ndarray) -> np.ndarray:
+        """
+            Parameter u at arc length `s` in [0, length]. The segment is found by searchsorted on `arc_length`,
+            u(s) is the cubic Hermite with du/ds=1/|dx/du| at the vertices (linear if the curve has no derivative).
+        """
+        s = np.asarray(s, dtype=float)
+        d = self.derivative()
+        if d is NotImplemented:
+            return np.interp(s, self.arc_length, self._mesh[0])
+        g = 1.0/np.hypot(*d)
+        return _inverse_arc_length(self.arc_length[None, :], self._mesh[0], g[None, :], s.reshape(1, -1)).reshape(s.shape)
 
-        return np.sqrt(dx**2+dy**2)*(1 + (2.0*m1**2+2.0*m2**2-m1*m2)/30)
+    def remesh(self, num: int = None, /) -> "Curve":
+        """ resample `num` points equally spaced in arc length, the new parameter u is the normalized arc length """
+        num = num or len(self.points())
+        u = self.inverse_arc_length(np.linspace(0.0, self.length, num))
+        return self.__class__(self.points(u), [np.linspace(0, 1, num)])
 
-    @cached_property
-    def length(self):
-        return np.sum(self.dl)
+    def trim(self, u_min: float = None, u_max: float = None, /, num: int = None) -> "Curve":
+        """ part of the curve with u_min <= u <= u_max, resampled by `num` points equally spaced in arc length """
+        u = self._mesh[0]
+        u_min = u[0] if u_min is None else u_min
+        u_max = u[-1] if u_max is None else u_max
+        num = num or max(2, np.count_nonzero((u >= u_min) & (u <= u_max)))
+        s_min, s_max = np.interp([u_min, u_max], u, self.arc_length)
+        u_new = self.inverse_arc_length(np.linspace(s_min, s_max, num))
+        return self.__class__(self.points(u_new), [np.linspace(0, 1, num)])
 
     def integral(self, func: Callable[[_TCoord, _TCoord], _TCoord]) -> float:
         x, y = self.xyz
@@ -65,14 +92,25 @@ class Curve(GeoObject):
     # def average(self, func: Callable[[_TCoord, _TCoord], _TCoord]) -> float:
     #     return self.integral(func)/self.length
 
-    def encloses_point(self, *x: float, **kwargs) -> bool:
-        return super().enclosed(**x, **kwargs)
+    def encloses_point(self, *x: float, **kwargs) -> Union[bool, np.ndarray]:
+        """
+            Points inside the polygon of the vertices of this curve (closed implicitly), by winding number.
+            x : coordinates, scalar or arrays of any (broadcastable) shape
+        """
+        shape = np.broadcast(*x).shape
+        inside = super().encloses_point(*x, **kwargs)
+        res = np.zeros(shape, dtype=bool)
+        idx = np.flatnonzero(inside)
+        if len(idx) > 0:
+            px, py = [np.broadcast_to(d, shape).ravel()[idx] for d in x]
+            res.ravel()[idx] = winding_number(px, py, self.points()) != 0
+        return res if len(shape) > 0 else bool(res)
 
-    def trim(self):
-        return NotImplemented
-
-    def remesh(self, mesh_type=None):
-        return NotImplemented
+    def intersection(self, other: "Curve") -> np.ndarray:
+        """ intersection points of the polylines of two curves, shape=[num,2] """
+        a = self.points()
+        i, _, s, _ = intersect_polylines(a, other.points())
+        return a[i]+s[:, None]*(a[i+1]-a[i])
 
 
 class Line(Curve):
@@ -81,9 +119,156 @@ class Line(Curve):
 
 
 def intersect2d(a0: Point, a1: Point, b0: Point, b1: Point) -> Tuple[float, float]:
+    s, t = intersect_segments(*[np.asarray(p, dtype=float).reshape(1, 2) for p in (a0, a1, b0, b1)])
+    return s[0], t[0]
+
+
+def _chord_length(x: np.ndarray, y: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+        Arc length of the segments between nodes along the last axis, chord length with the cubic correction
+        from the tangents (a,b) at both ends.
+            x, y : coordinates of the nodes, shape=[...,n]
+            a, b : tangents at the nodes, shape=[...,n]
+        Return: shape=[...,n-1]
+    """
+    dx = x[..., 1:]-x[..., :-1]
+    dy = y[..., 1:]-y[..., :-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m1 = np.nan_to_num((-a[..., :-1]*dy+b[..., :-1]*dx)/(a[..., :-1]*dx+b[..., :-1]*dy))
+        m2 = np.nan_to_num((-a[..., 1:]*dy+b[..., 1:]*dx)/(a[..., 1:]*dx+b[..., 1:]*dy))
+    return np.sqrt(dx**2+dy**2)*(1 + (2.0*m1**2+2.0*m2**2-m1*m2)/30)
+
+
+def _inverse_arc_length(arc: np.ndarray, u: np.ndarray, g: np.ndarray, s: np.ndarray) -> np.ndarray:
+    """
+        Parameter at arc length for a family of curves sharing parameter nodes `u` (shape=[n]).
+            arc : cumulative arc length, shape=[m,n]
+            g   : du/ds at the nodes, shape=[m,n]
+            s   : arc length, shape=[m,k]
+        All rows are searched at once: each row is normalized to [0,1] and shifted by its row index.
+        Return: shape=[m,k]
+    """
+    m, n = arc.shape
+    total = arc[:, -1:]
+    total = np.where(total > 0, total, 1.0)
+    row = np.arange(m)[:, None]
+    pos = np.searchsorted((arc/total+row).ravel(), (s/total+row).ravel(), side="right").reshape(s.shape)-1
+    seg = np.clip(pos-row*n, 0, n-2)
+
+    s0 = np.take_along_axis(arc, seg, axis=1)
+    h = np.take_along_axis(arc, seg+1, axis=1)-s0
+    g0 = np.take_along_axis(g, seg, axis=1)
+    g1 = np.take_along_axis(g, seg+1, axis=1)
+    u0, u1 = u[seg], u[seg+1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.clip(np.nan_to_num((s-s0)/h), 0.0, 1.0)
+    h00, h10, h01, h11 = 2*t**3-3*t**2+1, t**3-2*t**2+t, -2*t**3+3*t**2, t**3-t**2
+    res = h00*u0+h10*h*g0+h01*u1+h11*h*g1
+    return np.clip(res, u0, u1)
+
+
+def _expand_ranges(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ all pairs (k, i) with lo[k] <= i < hi[k] , without Python loops """
+    count = np.maximum(hi-lo, 0)
+    owner = np.repeat(np.arange(len(lo)), count)
+    return owner, np.repeat(lo-np.cumsum(count)+count, count)+np.arange(count.sum())
+
+
+def intersect_segments(a0: np.ndarray, a1: np.ndarray, b0: np.ndarray, b1: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Vectorized `intersect2d`, segments a0-a1 and b0-b1 (shape=[n,2]) intersect at a0+s*(a1-a0) = b0+t*(b1-b0).
+        Return: s, t ,  nan for parallel segments
+    """
     da = a1-a0
     db = b1-b0
-    dp = a0-b0
-    dap = [-da[1], da[0]]
-    dbp = [-db[1], db[0]]
-    return (np.dot(dbp, dp) / np.dot(dbp, da).astype(float)), (np.dot(dap, dp) / np.dot(dap, db).astype(float))
+    r = b0-a0
+    den = da[:, 0]*db[:, 1]-da[:, 1]*db[:, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.where(den != 0, (r[:, 0]*db[:, 1]-r[:, 1]*db[:, 0])/den, np.nan)
+        t = np.where(den != 0, (r[:, 0]*da[:, 1]-r[:, 1]*da[:, 0])/den, np.nan)
+    return s, t
+
+
+def intersect_polylines(a: np.ndarray, b: np.ndarray, a_offsets: np.ndarray = None, b_offsets: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+        All intersections of the segments of packed polylines `a` and `b`.
+
+        a, b      : packed vertices, shape=[n,2]
+        *_offsets : start of each polyline in the packed vertices (and the end, len(a)), default is one polyline
+
+        Pairs of segments overlapping in x are enumerated from two sorted lists of x_min (sweep line):
+        pairs with  a.x_min <= b.x_min <= a.x_max , and pairs with  b.x_min < a.x_min <= b.x_max .
+        The cost is O((n+m) log(n+m) + k), k is the number of pairs overlapping in x, instead of O(n*m).
+        Parallel (and collinear) segments are not reported.
+
+        Return: i, j, s, t  , intersection at a[i]+s*(a[i+1]-a[i]) = b[j]+t*(b[j+1]-b[j]), s,t in [0,1]
+    """
+    def segments(p, offsets):
+        p = np.asarray(p, dtype=float)
+        start = np.ones(len(p), dtype=bool)
+        start[-1] = False
+        if offsets is not None:
+            offsets = np.asarray(offsets)
+            start[offsets[1:-1]-1] = False
+            start[offsets[-1]-1:] = False
+        idx = np.flatnonzero(start)
+        return idx, p[idx], p[idx+1]
+
+    ia, a0, a1 = segments(a, a_offsets)
+    ib, b0, b1 = segments(b, b_offsets)
+
+    a_min, a_max = np.minimum(a0, a1), np.maximum(a0, a1)
+    b_min, b_max = np.minimum(b0, b1), np.maximum(b0, b1)
+
+    a_order = np.argsort(a_min[:, 0], kind="stable")
+    b_order = np.argsort(b_min[:, 0], kind="stable")
+    a_x = a_min[a_order, 0]
+    b_x = b_min[b_order, 0]
+
+    # a.x_min <= b.x_min <= a.x_max
+    p0, k0 = _expand_ranges(np.searchsorted(b_x, a_min[:, 0], side="left"), np.searchsorted(b_x, a_max[:, 0], side="right"))
+    # b.x_min < a.x_min <= b.x_max
+    q0, k1 = _expand_ranges(np.searchsorted(a_x, b_min[:, 0], side="right"), np.searchsorted(a_x, b_max[:, 0], side="right"))
+
+    pa = np.concatenate([p0, a_order[k1]])
+    pb = np.concatenate([b_order[k0], q0])
+
+    # y overlap
+    hit = (a_min[pa, 1] <= b_max[pb, 1]) & (b_min[pb, 1] <= a_max[pa, 1])
+    pa, pb = pa[hit], pb[hit]
+
+    s, t = intersect_segments(a0[pa], a1[pa], b0[pb], b1[pb])
+    hit = (s >= 0) & (s <= 1) & (t >= 0) & (t <= 1)
+    order = np.lexsort((pb[hit], pa[hit]))
+    return ia[pa[hit]][order], ib[pb[hit]][order], s[hit][order], t[hit][order]
+
+
+def winding_number(x: np.ndarray, y: np.ndarray, vertices: np.ndarray) -> np.ndarray:
+    """
+        Winding number of points (x,y) with respect to the polygon `vertices` (shape=[m,2], closed implicitly).
+
+        Points are sorted by y once, each edge only visits the points in its y-band (searchsorted),
+        so the cost is O((n+m) log n + n*k), k is the number of edges crossing a horizontal line.
+    """
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    vertices = np.asarray(vertices, dtype=float)
+    if not np.array_equal(vertices[0], vertices[-1]):
+        vertices = np.vstack([vertices, vertices[:1]])
+    x0, y0 = vertices[:-1].T
+    x1, y1 = vertices[1:].T
+
+    order = np.argsort(y, kind="stable")
+    ys = y[order]
+
+    up = y0 <= y1
+    lo = np.searchsorted(ys, np.where(up, y0, y1), side="left")
+    hi = np.searchsorted(ys, np.where(up, y1, y0), side="left")
+
+    # (edge, point) pairs of all y-bands
+    edge, pos = _expand_ranges(lo, hi)
+    pt = order[pos]
+
+    is_left = (x1[edge]-x0[edge])*(y[pt]-y0[edge])-(x[pt]-x0[edge])*(y1[edge]-y0[edge])
+    contrib = np.where(up[edge], is_left > 0, -(is_left < 0).astype(int))
+    return np.bincount(pt, weights=contrib, minlength=len(x)).astype(int)
@@ -129,15 +129,16 @@ class GeoObject:
     def remesh(self, mesh_type=None, /, **kwargs):
         return NotImplemented
 
-    def encloses_point(self, *x: float, tolerance=None) -> bool:
-        x = np.asarray(x)
+    def encloses_point(self, *x: float, tolerance=None) -> Union[bool, np.ndarray]:
+        """
+            Points inside the bounding box (widened by `tolerance`), subclasses refine the test.
+            x : coordinates, scalar or arrays of any (broadcastable) shape
+        """
+        tolerance = tolerance or 0.0
         bbox = self.bbox
-        if np.any(x < bbox[:, 0]) or np.any(x > bbox[:, 1]):
-            return False
-        elif tolerance is None:
-            return True
-        else:
-            return NotImplemented
+        res = np.all([(d >= bbox[idx, 0]-tolerance) & (d <= bbox[idx, 1]+tolerance)
+                      for idx, d in enumerate(np.broadcast_arrays(*x))], axis=0)
+        return res if res.ndim > 0 else bool(res)
 
     def derivative(self,  *args, **kwargs):
         return NotImplemented
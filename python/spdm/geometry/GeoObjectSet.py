@@ -0,0 +1,139 @@
+from functools import cached_property
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from ..common.logger import logger
+from .Curve import Curve, winding_number
+from .GeoObject import GeoObject
+
+
+class GeoObjectSet:
+    """
+        A collection of 2-D GeoObjects (e.g. wall outline, coils) with a bounding-box R-tree for batch queries.
+
+        The R-tree is bulk loaded (Sort-Tile-Recursive) into flat arrays, one per level. Queries walk
+        the tree level by level for all points at once. Candidate (point, object) pairs are then tested
+        exactly: closed curves by winding number over their packed vertices, other objects by `encloses_point`.
+    """
+    NODE_CAPACITY = 8
+
+    def __init__(self, objects: Sequence[GeoObject]) -> None:
+        self._objects = list(objects)
+        if any(obj.ndims != 2 for obj in self._objects):
+            raise NotImplementedError(f"Only 2-D objects are supported!")
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def __getitem__(self, idx) -> GeoObject:
+        return self._objects[idx]
+
+    def __iter__(self):
+        yield from self._objects
+
+    @cached_property
+    def bbox(self) -> np.ndarray:
+        """ shape=[num_of_objects,4] : xmin,ymin,xmax,ymax """
+        return np.asarray([[b[0, 0], b[1, 0], b[0, 1], b[1, 1]] for b in (obj.bbox for obj in self._objects)], dtype=float)
+
+    @cached_property
+    def vertices(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ packed vertices of curves, shape=[num_of_vertices,2], and offsets (shape=[num_of_objects+1]) """
+        pts = [(obj.points() if isinstance(obj, Curve) else np.zeros([0, 2])) for obj in self._objects]
+        offsets = np.cumsum([0]+[len(p) for p in pts])
+        return np.concatenate(pts, axis=0), offsets
+
+    @cached_property
+    def _rtree(self):
+        """
+            levels from leaves to root: (bbox, start, count), children of node k are entries
+            start[k]:start[k]+count[k] of the level below. Level 0 entries are objects `perm`.
+        """
+        cap = GeoObjectSet.NODE_CAPACITY
+
+        def str_order(bbox):
+            n = len(bbox)
+            num_slices = int(np.ceil(np.sqrt(np.ceil(n/cap))))
+            cx = (bbox[:, 0]+bbox[:, 2])*0.5
+            cy = (bbox[:, 1]+bbox[:, 3])*0.5
+            order = np.argsort(cx, kind="stable")
+            slices = np.arange(n)*num_slices//max(n, 1)
+            return order[np.lexsort((cy[order], slices))]
+
+        perm = str_order(self.bbox)
+        bbox = self.bbox[perm]
+        levels = []
+        start = count = None
+        while True:
+            levels.append((bbox, start, count))
+            if len(bbox) <= cap:
+                break
+            n = len(bbox)
+            start = np.arange(0, n, cap)
+            count = np.minimum(cap, n-start)
+            bbox = np.stack([np.minimum.reduceat(bbox[:, 0], start), np.minimum.reduceat(bbox[:, 1], start),
+                             np.maximum.reduceat(bbox[:, 2], start), np.maximum.reduceat(bbox[:, 3], start)], axis=-1)
+            order = str_order(bbox)
+            bbox, start, count = bbox[order], start[order], count[order]
+        return perm, levels
+
+    def query_bbox(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """ (point, object) pairs with the point inside the bounding box of the object """
+        perm, levels = self._rtree
+        res_pt = []
+        res_obj = []
+
+        def visit(level, nodes, idx):
+            bbox, start, count = levels[level]
+            px, py = x[idx], y[idx]
+            for node in nodes:
+                b = bbox[node]
+                sub = idx[(px >= b[0]) & (px <= b[2]) & (py >= b[1]) & (py <= b[3])]
+                if len(sub) == 0:
+                    continue
+                elif level == 0:
+                    res_pt.append(sub)
+                    res_obj.append(np.full(len(sub), perm[node]))
+                else:
+                    visit(level-1, range(start[node], start[node]+count[node]), sub)
+
+        visit(len(levels)-1, range(len(levels[-1][0])), np.arange(len(x)))
+
+        if len(res_pt) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        return np.concatenate(res_pt), np.concatenate(res_obj)
+
+    def query(self, *xy: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Objects containing points `xy`.
+            Return: point, object  , index pairs sorted by point (flattened index of `xy`)
+        """
+        x, y = [np.ravel(d).astype(float) for d in np.broadcast_arrays(*xy)]
+        pt, obj = self.query_bbox(x, y)
+        if len(pt) == 0:
+            return pt, obj
+
+        vertices, offsets = self.vertices
+        inside = np.zeros(len(pt), dtype=bool)
+        order = np.argsort(obj, kind="stable")
+        groups = np.flatnonzero(np.diff(obj[order], prepend=-1))
+        for sel in np.split(order, groups[1:]):
+            k = obj[sel[0]]
+            if offsets[k+1] > offsets[k]:
+                inside[sel] = winding_number(x[pt[sel]], y[pt[sel]], vertices[offsets[k]:offsets[k+1]]) != 0
+            else:
+                inside[sel] = self._objects[k].encloses_point(x[pt[sel]], y[pt[sel]])
+
+        pt, obj = pt[inside], obj[inside]
+        order = np.lexsort((obj, pt))
+        return pt[order], obj[order]
+
+    def locate(self, *xy: np.ndarray) -> np.ndarray:
+        """ index of the first object containing each point, -1 if none, shape=xy.shape """
+        shape = np.broadcast(*xy).shape
+        pt, obj = self.query(*xy)
+        res = np.full(int(np.prod(shape)), -1)
+        pt, first = np.unique(pt, return_index=True)  # pairs are sorted by (point, object)
+        res[pt] = obj[first]
+        return res.reshape(shape)
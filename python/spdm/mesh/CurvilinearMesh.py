@@ -1,21 +1,51 @@
 import collections
 from functools import cached_property, lru_cache
 from math import log
-from typing import Iterator, Sequence, Type, Union
+from typing import Iterator, Sequence, Tuple, Type, Union
 
 import numpy as np
-from scipy import interpolate
+from scipy import interpolate, sparse
 from scipy.ndimage.interpolation import geometric_transform
+from scipy.spatial import cKDTree
 
 from ..geometry.BSplineSurface import BSplineSurface
 from ..geometry.CubicSplineCurve import CubicSplineCurve
-from ..geometry.Curve import Curve
+from ..geometry.CubicSplineCurveFamily import CubicSplineCurveFamily
+from ..geometry.Curve import Curve, _chord_length
 from ..geometry.GeoObject import GeoObject
 from ..geometry.Point import Point
 from ..common.logger import logger
+from ..data.Function import Function, FunctionBundle
 from ..util.utilities import convert_to_named_tuple
 from .Mesh import Mesh
-from .StructuredMesh import StructuredMesh
+from .StructuredMesh import StructuredMesh, _tensor_weights
+
+
+def _bilinear_inverse(p00, p10, p01, p11, p, max_iterations=6) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Local coordinates (s,t) of points `p` in quadrilateral cells, solving the bilinear map
+            X(s,t)=p00(1-s)(1-t)+p10 s(1-t)+p01(1-s)t+p11 s t
+        by Newton iteration. All arguments have shape [n,2].
+    """
+    ax, ay = (p10-p00).T
+    bx, by = (p01-p00).T
+    cx, cy = (p11-p10-p01+p00).T
+    fx0, fy0 = (p00-p).T
+    s = np.full(len(p), 0.5)
+    t = np.full(len(p), 0.5)
+    with np.errstate(all="ignore"):
+        for _ in range(max_iterations):
+            st = s*t
+            fx = fx0+ax*s+bx*t+cx*st
+            fy = fy0+ay*s+by*t+cy*st
+            jsx = ax+cx*t
+            jsy = ay+cy*t
+            jtx = bx+cx*s
+            jty = by+cy*s
+            det = jsx*jty-jsy*jtx
+            s = s-(jty*fx-jtx*fy)/det
+            t = t-(jsx*fy-jsy*fx)/det
+    return s, t
 
 
 class CurvilinearMesh(StructuredMesh):
@@ -50,7 +80,7 @@ class CurvilinearMesh(StructuredMesh):
             raise TypeError(
                 f"geo_mesh should be np.ndarray, Sequence[GeoObject] or GeoObject, not {type(geo_mesh)}")
 
-        super().__init__(*args, uv=np.asarray(uv),
+        super().__init__(*args, uv=[np.asarray(d) for d in uv],
                          shape=shape, rank=rank, ndims=ndims, **kwargs)
         self._sub_surf = surf
 
@@ -76,8 +106,42 @@ class CurvilinearMesh(StructuredMesh):
 
     @cached_property
     def xy(self) -> np.ndarray:
+        if isinstance(self._sub_surf, CubicSplineCurveFamily):
+            return self._sub_surf.points(self.uv[1])
         return np.stack([surf.points(self.uv[1]) for idx, surf in enumerate(self._sub_surf)], axis=0)
 
+    @property
+    def points(self) -> Sequence[np.ndarray]:
+        return list(np.moveaxis(self.xy, -1, 0))
+
+    def parametric_map(self, *uv: np.ndarray) -> Tuple[Sequence[np.ndarray], np.ndarray]:
+        """ bilinear map of the cells, consistent with `locate` """
+        xy = self.xy.reshape(-1, self.ndims)
+        idx, w = _tensor_weights(self._uv, uv, "linear")
+        _, wu = _tensor_weights(self._uv, uv, "linear", orders=[1, 0])
+        _, wv = _tensor_weights(self._uv, uv, "linear", orders=[0, 1])
+        x, y = np.einsum("nk,nkd->dn", w, xy[idx])
+        (xu, yu), (xv, yv) = np.einsum("nk,nkd->dn", wu, xy[idx]), np.einsum("nk,nkd->dn", wv, xy[idx])
+        return [x, y], xu*yv-xv*yu
+
+    def control_volumes(self, order=2, breaks=None):
+        # knots of the source are not aligned with the parametric axes
+        return super().control_volumes(order)
+
+    def _interpolation_operator(self, *xy: np.ndarray, method="linear") -> sparse.csr_matrix:
+        """
+            Interpolation at physical coordinates `xy`, tensor product of 1-D weights in (u,v) space,
+            see `inverse`. Rows of points outside the mesh are zero.
+                linear : bilinear in the located cell
+                cubic  : local C1 (bi)cubic in (u,v)
+        """
+        u, v = self.inverse(*xy)
+        u, v = u.ravel(), v.ravel()
+        found = np.flatnonzero(~np.isnan(u))
+        idx, weight = _tensor_weights(self._uv, [u[found], v[found]], method)
+        rows = np.repeat(found, idx.shape[1])
+        return sparse.csr_matrix((weight.ravel(), (rows, idx.ravel())), shape=(len(u), int(np.prod(self.shape))))
+
     # def pushforward(self, new_uv):
     #     new_shape = [len(u) for u in new_uv]
     #     if new_shape != self.shape:
@@ -85,19 +149,209 @@ class CurvilinearMesh(StructuredMesh):
     #     return CurvilinearMesh(self._xy, new_uv, cycle=self.cycle)
 
     def interpolator(self, value,  **kwargs):
+        """ interpolator in (u,v) space """
         if value.shape != self.shape:
             raise ValueError(f"{value.shape} {self.shape}")
 
-        if self.ndims == 1:
+        if self.rank == 1:
             interp = interpolate.InterpolatedUnivariateSpline(
-                self._dims[0], value,  **kwargs)
-        elif self.ndims == 2:
+                self._uv[0], value,  **kwargs)
+        elif self.rank == 2:
             interp = interpolate.RectBivariateSpline(
-                self._dims[0], self._dims[1], value, ** kwargs)
+                self._uv[0], self._uv[1], value, ** kwargs)
         else:
-            raise NotImplementedError(f"NDIMS {self.ndims}>2")
+            raise NotImplementedError(f"RANK {self.rank}>2")
         return interp
 
+    @cached_property
+    def _cell_centers(self) -> np.ndarray:
+        xy = self.xy
+        return ((xy[:-1, :-1]+xy[1:, :-1]+xy[:-1, 1:]+xy[1:, 1:])*0.25).reshape(-1, self.ndims)
+
+    @cached_property
+    def _kdtree(self) -> cKDTree:
+        """ KD-tree of cell centers """
+        return cKDTree(self._cell_centers)
+
+    @cached_property
+    def _cell_radius(self) -> float:
+        """ largest distance from a cell center to its corners, a point inside a cell is within it from the center """
+        xy = self.xy
+        centers = self._cell_centers.reshape(*(np.asarray(self.shape)-1), self.ndims)
+        return max(np.max(np.linalg.norm(corner-centers, axis=-1))
+                   for corner in (xy[:-1, :-1], xy[1:, :-1], xy[:-1, 1:], xy[1:, 1:]))
+
+    def locate(self, *xy: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+            Find the cells containing points `xy` (physical coordinates).
+            Candidate cells are those with the nearest centers (KD-tree), the search widens until
+            the centers are farther than the largest cell radius. The local coordinates
+            in the cell are refined by Newton iteration on the bilinear map.
+
+            Return: i, j, s, t  (flattened) ,  cell [i,j], local coordinates s,t in [0,1].
+                    i=j=-1 and s=t=nan for points outside the mesh.
+        """
+        if self.rank != 2 or self.ndims != 2:
+            raise NotImplementedError(f"rank={self.rank} ndims={self.ndims}")
+
+        pts = np.stack([np.ravel(p) for p in np.broadcast_arrays(*xy)], axis=-1).astype(float)
+        num = len(pts)
+        nv = self.shape[1]
+        mesh_xy = self.xy
+
+        cell_i = np.full(num, -1)
+        cell_j = np.full(num, -1)
+        cell_s = np.full(num, np.nan)
+        cell_t = np.full(num, np.nan)
+
+        tol = CurvilinearMesh.TOLERANCE
+
+        tree = self._kdtree
+        radius = self._cell_radius*(1+tol)+tol
+
+        todo = np.arange(num)
+        k_prev, k = 0, 1
+        while len(todo) > 0 and k_prev < tree.n:
+            dist, cells = tree.query(pts[todo], k=k, distance_upper_bound=radius, workers=-1)
+            dist = dist.reshape(len(todo), k)
+            cells = cells.reshape(len(todo), k)
+            for cell in cells[:, k_prev:].T:
+                found = cell_i[todo] >= 0
+                candidate = ~found & (cell < tree.n)  # cell==tree.n : no more centers within `radius`
+                idx, cell = todo[candidate], cell[candidate]
+                if len(idx) == 0:
+                    break
+                i, j = np.divmod(cell, nv-1)
+                s, t = _bilinear_inverse(mesh_xy[i, j], mesh_xy[i+1, j], mesh_xy[i, j+1], mesh_xy[i+1, j+1], pts[idx])
+                inside = (s >= -tol) & (s <= 1+tol) & (t >= -tol) & (t <= 1+tol)
+                cell_i[idx[inside]] = i[inside]
+                cell_j[idx[inside]] = j[inside]
+                cell_s[idx[inside]] = np.clip(s[inside], 0, 1)
+                cell_t[idx[inside]] = np.clip(t[inside], 0, 1)
+            # points with k candidates within `radius` may have more
+            todo = todo[(cell_i[todo] < 0) & np.isfinite(dist[:, -1])]
+            k_prev, k = k, min(k*8, tree.n)
+
+        return cell_i, cell_j, cell_s, cell_t
+
+    def inverse(self, *xy: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Map physical coordinates `xy` to mesh coordinates (u,v), nan for points outside the mesh.
+        """
+        shape = np.broadcast(*xy).shape
+        i, j, s, t = self.locate(*xy)
+        found = i >= 0
+        i = np.where(found, i, 0)
+        j = np.where(found, j, 0)
+        u0, u1 = self._uv
+        u = u0[i]+s*(u0[i+1]-u0[i])
+        v = u1[j]+t*(u1[j+1]-u1[j])
+        return u.reshape(shape), v.reshape(shape)
+
+    def evaluate(self, value: np.ndarray, *xy: np.ndarray, method="linear") -> np.ndarray:
+        """
+            Evaluate `value` (defined on mesh) at physical coordinates `xy`, nan for points outside the mesh.
+                linear : bilinear in the located cell
+                cubic  : bicubic spline in (u,v) space
+        """
+        value = np.asarray(value)
+        if value.shape != self.shape:
+            raise ValueError(f"{value.shape} {self.shape}")
+        shape = np.broadcast(*xy).shape
+        if method == "linear":
+            i, j, s, t = self.locate(*xy)
+            found = i >= 0
+            i = np.where(found, i, 0)
+            j = np.where(found, j, 0)
+            res = value[i, j]*(1-s)*(1-t)+value[i+1, j]*s*(1-t)+value[i, j+1]*(1-s)*t+value[i+1, j+1]*s*t
+        elif method == "cubic":
+            u, v = self.inverse(*xy)
+            res = np.full(u.shape, np.nan)
+            found = ~np.isnan(u)
+            res[found] = self.interpolator(value)(u[found], v[found], grid=False)
+        else:
+            raise ValueError(f"Unknown interpolation method '{method}'")
+        return res.reshape(shape)
+
+    @cached_property
+    def dl(self) -> np.ndarray:
+        """
+            Arc length of the segments between nodes along v on all surfaces, shape=[n_u, n_v-1].
+            Chord length with the cubic correction (see Curve._chord_length), tangents from the surface splines.
+        """
+        x, y = np.moveaxis(self.xy, -1, 0)
+        if isinstance(self._sub_surf, CubicSplineCurveFamily):
+            a, b = np.moveaxis(self._sub_surf.derivative(self.uv[1]), -1, 0)
+        else:
+            a, b = np.moveaxis(np.stack([(np.zeros([len(self.uv[1]), 2]) if not hasattr(surf, "_derivative")
+                                          else surf._derivative(self.uv[1])) for surf in self._sub_surf]), -1, 0)
+        return _chord_length(x, y, a, b)
+
+    def _on_mesh(self, value) -> np.ndarray:
+        """ value on mesh nodes, `value` is an array or a callable f(x,y) (e.g. Field) """
+        if callable(value):
+            value = value(*np.moveaxis(self.xy, -1, 0))
+        return np.asarray(value, dtype=float)
+
+    def surface_average_operator(self, weight=None) -> sparse.csr_matrix:
+        r"""
+            Sparse matrix A, shape=[n_u, mesh.size], so that A @ value.ravel() is the average of `value`
+            on each surface (u=const) with the measure `weight*dl`, e.g. weight=1/|grad psi| for flux-surface average.
+                <f> = \oint f weight dl / \oint weight dl
+            Trapezoidal weights are computed once per (mesh, weight) and cached with LRU eviction.
+            Degenerate surfaces (zero length, e.g. the magnetic axis) are averaged with equal weights.
+        """
+        if self.rank != 2:
+            raise NotImplementedError(f"rank={self.rank}")
+
+        if weight is not None:
+            weight = self._on_mesh(weight)
+            if weight.shape != self.shape:
+                raise ValueError(f"{weight.shape} {self.shape}")
+
+        key = None if weight is None else hash(weight.tobytes())
+        op = self._operator_cache.get(key, None)
+        if op is not None:
+            self._operator_cache.move_to_end(key)
+            return op
+
+        dl = self.dl
+        w = np.zeros(self.shape)
+        w[:, :-1] += dl*0.5
+        w[:, 1:] += dl*0.5
+        if weight is not None:
+            w *= weight
+        total = w.sum(axis=1, keepdims=True)
+        w = np.where(total != 0, w/np.where(total != 0, total, 1.0), 1.0/self.shape[1])
+
+        nu, nv = self.shape
+        op = sparse.csr_matrix((w.ravel(), np.arange(nu*nv), np.arange(0, nu*nv+1, nv)), shape=(nu, nu*nv))
+
+        self._operator_cache[key] = op
+        while len(self._operator_cache) > self.OPERATOR_CACHE_SIZE:
+            self._operator_cache.popitem(last=False)
+        return op
+
+    def surface_average(self, value, /, weight=None) -> Union[Function, FunctionBundle]:
+        """
+            Average of one or many fields on all surfaces, as one sparse matrix product.
+            value : array shape=mesh.shape, or [num_of_fields,*mesh.shape], or a callable f(x,y) (e.g. Field)
+            weight: see surface_average_operator
+            Return: Function of u (e.g. psi), or FunctionBundle for many fields
+        """
+        op = self.surface_average_operator(weight)
+        if isinstance(value, np.ndarray) or callable(value):
+            data = self._on_mesh(value)
+        else:
+            data = np.stack([self._on_mesh(v) for v in value])
+
+        if data.shape == self.shape:
+            return Function(self.uv[0], op @ data.ravel())
+        elif data.shape[1:] == self.shape:
+            return FunctionBundle(self.uv[0], (op @ data.reshape(data.shape[0], -1).T).T)
+        else:
+            raise ValueError(f"{data.shape} {self.shape}")
+
     @cached_property
     def boundary(self):
         return convert_to_named_tuple({"inner": self.axis(0, 0),  "outer": self.axis(-1, 0)})
@@ -1,8 +1,10 @@
 import collections
+import weakref
 from functools import cached_property
 from typing import Callable, Iterator, Sequence, Tuple, Type, Union
 
 import numpy as np
+from scipy import sparse
 
 from ..common.SpObject import SpObject
 from ..geometry.GeoObject import GeoObject
@@ -53,6 +55,9 @@ class Mesh(SpObject):
             cycle = cycle * self._ndims
         self._cycle = cycle
 
+        self._operator_cache = collections.OrderedDict()
+        self._remap_cache = weakref.WeakKeyDictionary()
+
         # logger.debug(f"Create {self.__class__.__name__} rank={self.rank} shape={self.shape} ndims={self.ndims}")
 
     @property
@@ -99,12 +104,112 @@ class Mesh(SpObject):
     def xy(self) -> Sequence[np.ndarray]:
         return NotImplemented
 
+    @property
+    def points(self) -> Sequence[np.ndarray]:
+        """ coordinates of mesh nodes, one (broadcastable) array per dimension of space """
+        return self.xy
+
     def new_dataset(self, *args, **kwargs):
         return np.ndarray(self._shape, *args, **kwargs)
 
     def interpolator(self, Z):
         return NotImplemented
 
+    OPERATOR_CACHE_SIZE = 16
+
+    def interpolation_operator(self, *points, method="linear"):
+        """
+            Sparse matrix W, shape=[num_of_points, mesh.size], so that  W @ value.ravel() is the
+            interpolation of `value` (defined on mesh) at `points`, see `_interpolation_operator`.
+            Operators are cached per mesh, keyed by (method, hash of points), with LRU eviction.
+        """
+        points = [np.asarray(p, dtype=float) for p in np.broadcast_arrays(*points)]
+        key = (method, points[0].shape, *[hash(p.tobytes()) for p in points])
+        op = self._operator_cache.get(key, None)
+        if op is not None:
+            self._operator_cache.move_to_end(key)
+            return op
+
+        op = self._interpolation_operator(*points, method=method)
+        if op is not NotImplemented:
+            self._operator_cache[key] = op
+            while len(self._operator_cache) > self.OPERATOR_CACHE_SIZE:
+                self._operator_cache.popitem(last=False)
+        return op
+
+    def _interpolation_operator(self, *points, method="linear"):
+        """ build the interpolation operator at `points` (not cached) """
+        return NotImplemented
+
+    def interpolate(self, value, *points, method="linear"):
+        return NotImplemented
+
+    def contours(self, value, levels, /, center=None):
+        return NotImplemented
+
+    def control_volumes(self, order=2, breaks=None):
+        return NotImplemented
+
+    def remap_operator(self, target, /, method="bilinear", order=2):
+        """
+            Sparse matrix R, shape=[target.size, self.size], so that R @ value.ravel() maps `value` on this mesh
+            to the nodes of `target`. Built once per (target, method) and cached while `target` is alive,
+            apart from the cache of `interpolation_operator`.
+                bilinear    : (bi)linear interpolation
+                spline      : local C1 (bi)cubic interpolation
+                conservative: average of the bilinear reconstruction over the control volume of each target node,
+                              the integral (sum of value*volume) is conserved where the meshes overlap.
+                              `order` is the number of Gauss points per axis in each sub-interval.
+        """
+        method = {"linear": "bilinear", "cubic": "spline"}.get(method, method)
+        key = (method, order) if method == "conservative" else method
+        cache = self._remap_cache.setdefault(target, {})
+        op = cache.get(key, None)
+        if op is not None:
+            return op
+
+        if method == "bilinear":
+            op = self._interpolation_operator(*np.broadcast_arrays(*target.points), method="linear")
+        elif method == "spline":
+            op = self._interpolation_operator(*np.broadcast_arrays(*target.points), method="cubic")
+        elif method == "conservative":
+            points, avg, _ = target.control_volumes(order, breaks=self.breaks)
+            op = avg @ self._interpolation_operator(*points, method="linear")
+        else:
+            raise ValueError(f"Unknown remap method '{method}'")
+
+        if op is NotImplemented:
+            raise NotImplementedError(f"{self.__class__.__name__} -> {target.__class__.__name__}")
+
+        op = sparse.csr_matrix(op)
+        cache[key] = op
+        return op
+
+    def remap(self, value, target, /, method="bilinear", **kwargs) -> np.ndarray:
+        """
+            Map one or many fields on this mesh to `target`, as one sparse matrix product.
+            value: array  shape=mesh.shape, or [num_of_fields,*mesh.shape] (a sequence of Field is accepted)
+            Return: shape=target.shape or [num_of_fields,*target.shape]
+        """
+        if isinstance(value, np.ndarray):
+            data = value
+        else:
+            data = np.stack([np.asarray(v) for v in value])
+
+        op = self.remap_operator(target, method=method, **kwargs)
+
+        if data.shape == self.shape:
+            return (op @ data.ravel()).reshape(target.shape)
+        elif data.shape[1:] == self.shape:
+            return (op @ data.reshape(data.shape[0], -1).T).T.reshape(data.shape[0], *target.shape)
+        else:
+            raise ValueError(f"{data.shape} {self.shape}")
+
+    @property
+    def breaks(self) -> Sequence[np.ndarray]:
+        """ axis-aligned knots of the interpolation on this mesh (physical coordinates), if any """
+        return None
+
     def axis(self, *args, **kwargs) -> GeoObject:
         return NotImplemented
 
@@ -1,13 +1,17 @@
 from functools import cached_property, lru_cache
-from typing import Sequence, Tuple
+from typing import Iterator, Sequence, Tuple
 
 import numpy as np
+from scipy import sparse
 from scipy.interpolate import interpolate
+from skimage import measure
 
+from ..geometry.CubicSplineCurve import CubicSplineCurve
 from ..geometry.Curve import Line
 from ..geometry.Point import Point
 from ..common.logger import logger
-from .StructuredMesh import StructuredMesh
+from .CurvilinearMesh import CurvilinearMesh
+from .StructuredMesh import StructuredMesh, _axis_weights, _tensor_weights
 
 
 class RectilinearMesh(StructuredMesh):
@@ -20,7 +24,11 @@ class RectilinearMesh(StructuredMesh):
 
     """
 
-    def __init__(self, desc=None, *args,  **kwargs) -> None:
+    def __init__(self, desc=None, *args, sparse_xy=False, **kwargs) -> None:
+        """
+            sparse_xy : if True, `xy` returns broadcastable views of the axes (meshgrid(..., sparse=True)),
+                        shape [n0,1,...],[1,n1,...], instead of full coordinate arrays
+        """
         def normalize_dim(d):
             if isinstance(d, np.ndarray):
                 return d
@@ -31,6 +39,20 @@ class RectilinearMesh(StructuredMesh):
 
         self._dims = [normalize_dim(d) for d in args]
         super().__init__(*args, shape=[len(d) for d in self._dims],  **kwargs)
+        self._sparse_xy = sparse_xy
+
+        def uniform_step(d):
+            if len(d) < 2:
+                return None
+            step = (d[-1]-d[0])/(len(d)-1)
+            return step if np.allclose(np.diff(d), step, rtol=1.0e-8, atol=0) else None
+
+        self._steps = [uniform_step(d) for d in self._dims]
+
+    @property
+    def is_uniform(self) -> bool:
+        """ all axes are uniform (e.g. np.linspace), node index is computed in O(1) """
+        return all([step is not None for step in self._steps])
 
     @cached_property
     def bbox(self) -> Sequence[float]:
@@ -52,14 +74,37 @@ class RectilinearMesh(StructuredMesh):
             res = Point(*p0)
         return res
 
-    @cached_property
+    @property
+    def is_sparse_xy(self) -> bool:
+        return self._sparse_xy
+
+    @property
     def xy(self) -> Sequence[np.ndarray]:
+        """
+            coordinates of mesh nodes, indexing="ij"
+            sparse_xy=True: broadcastable views of the axes, nothing is allocated
+        """
         if self.ndims == 1:
             return [self._dims[0]]
-        elif self.ndims == 2:
-            return np.meshgrid(*self._dims, indexing="ij")
+        elif self._sparse_xy:
+            return np.meshgrid(*self._dims, indexing="ij", sparse=True, copy=False)
         else:
-            raise NotImplementedError()
+            return self._xy
+
+    @cached_property
+    def _xy(self) -> Sequence[np.ndarray]:
+        return np.meshgrid(*self._dims, indexing="ij")
+
+    @property
+    def parametric_axes(self) -> Sequence[np.ndarray]:
+        return self._dims
+
+    def parametric_map(self, *uv: np.ndarray) -> Tuple[Sequence[np.ndarray], np.ndarray]:
+        return uv, np.ones_like(uv[0])
+
+    @property
+    def breaks(self) -> Sequence[np.ndarray]:
+        return self._dims
 
     def point(self, *idx):
         return [d[idx[s]] for s, d in enumerate(self._dims)]
@@ -77,8 +122,227 @@ class RectilinearMesh(StructuredMesh):
 
         return interp
 
+    def _interpolation_operator(self, *points: np.ndarray, method="linear") -> sparse.csr_matrix:
+        """
+            Weights of the interpolation operator are tensor products of 1-D weights on each axis:
+                linear : (bi)linear, 2 nodes per axis
+                cubic  : local C1 cubic (Hermite), 4 nodes per axis
+        """
+        points = [np.asarray(p, dtype=float) for p in np.broadcast_arrays(*points)]
+        if len(points) != self.ndims:
+            raise ValueError(f"Need {self.ndims} coordinates, not {len(points)}")
+
+        num = points[0].size
+        idx, weight = _tensor_weights(self._dims, [p.ravel() for p in points], method, steps=self._steps)
+        rows = np.repeat(np.arange(num), idx.shape[1])
+        return sparse.csr_matrix((weight.ravel(), (rows, idx.ravel())), shape=(num, int(np.prod(self.shape))))
+
+    def interpolate(self, value, *points: np.ndarray, method="linear") -> np.ndarray:
+        """
+            Interpolate one or many fields on this mesh at `points`, as one sparse matrix product.
+            value: array  shape=mesh.shape, or [num_of_fields,*mesh.shape] (a sequence of Field is accepted)
+            Return: shape=points.shape or [num_of_fields,*points.shape]
+        """
+        if isinstance(value, np.ndarray):
+            data = value
+        else:
+            data = np.stack([np.asarray(v) for v in value])
+
+        op = self.interpolation_operator(*points, method=method)
+        shape = np.broadcast(*points).shape
+
+        if data.shape == self.shape:
+            return (op @ data.ravel()).reshape(shape)
+        elif data.shape[1:] == self.shape:
+            return (op @ data.reshape(data.shape[0], -1).T).T.reshape(data.shape[0], *shape)
+        else:
+            raise ValueError(f"{data.shape} {self.shape}")
+
+    EVALUATE_CHUNK_SIZE = 1 << 16
+
+    def evaluate(self, value: np.ndarray, *points: np.ndarray, method="cubic", dx=0, dy=0) -> np.ndarray:
+        """
+            Vectorized (bi)linear/(bi)cubic evaluation of `value` (or its derivative) at scattered points,
+            without building an operator. Uniform axes use O(1) index computation, non-uniform
+            axes use searchsorted.
+                dx,dy : order of derivative along axis 0 and 1
+        """
+        value = np.asarray(value)
+        if value.shape != self.shape:
+            raise ValueError(f"{value.shape} {self.shape}")
+        points = [np.asarray(p, dtype=float) for p in np.broadcast_arrays(*points)]
+        if len(points) != self.ndims or self.ndims > 2:
+            raise NotImplementedError(f"ndims={self.ndims} points={len(points)}")
+
+        shape = points[0].shape
+        points = [p.ravel() for p in points]
+        orders = [dx, dy][:self.ndims]
+        res = np.empty(points[0].size)
+
+        for start in range(0, res.size, RectilinearMesh.EVALUATE_CHUNK_SIZE):
+            s = slice(start, start+RectilinearMesh.EVALUATE_CHUNK_SIZE)
+            weights = [_axis_weights(d, p[s], method, order=order, step=step)
+                       for d, p, order, step in zip(self._dims, points, orders, self._steps)]
+            if self.ndims == 1:
+                (i0, w0), = weights
+                res[s] = np.einsum("ni,ni->n", value[i0], w0)
+            else:
+                (i0, w0), (i1, w1) = weights
+                res[s] = np.einsum("nij,ni,nj->n", value[i0[:, :, None], i1[:, None, :]], w0, w1)
+
+        return res.reshape(shape)
+
+    def critical_points(self, value: np.ndarray, /, max_iterations=16) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+            Find critical points (grad value = 0) of a 2-D field, or of a stack of fields  on this mesh.
+
+            value : shape= mesh.shape , or [num_of_slices, *mesh.shape]
+
+            1. candidate cells: both components of the grid gradient change sign over the cell corners
+            2. batched Newton iteration on the C1 (bi)cubic interpolation, starting from the cell centers
+            3. keep converged points inside their cell, remove duplicates
+
+            Return: index of slice, x, y, value, det(Hessian)
+                    det(Hessian) >0 : O-point (extremum),  <0 : X-point (saddle)
+        """
+        if self.ndims != 2:
+            raise NotImplementedError(f"ndims={self.ndims}")
+        value = np.asarray(value, dtype=float)
+        if value.shape == self.shape:
+            value = value[None, ...]
+        elif value.shape[1:] != self.shape:
+            raise ValueError(f"{value.shape} {self.shape}")
+
+        x_axis, y_axis = self._dims
+        gx, gy = np.gradient(value, x_axis, y_axis, axis=(1, 2))
+
+        def sign_change(g):
+            corners = np.stack([g[:, :-1, :-1], g[:, 1:, :-1], g[:, :-1, 1:], g[:, 1:, 1:]])
+            return (corners.min(axis=0) <= 0) & (corners.max(axis=0) >= 0)
+
+        k, i, j = np.nonzero(sign_change(gx) & sign_change(gy))
+
+        x = (x_axis[i]+x_axis[i+1])*0.5
+        y = (y_axis[j]+y_axis[j+1])*0.5
+
+        def derivatives(x, y):
+            i0, wx = zip(*[_axis_weights(x_axis, x, "cubic", order=n, step=self._steps[0]) for n in range(3)])
+            i1, wy = zip(*[_axis_weights(y_axis, y, "cubic", order=n, step=self._steps[1]) for n in range(3)])
+            v = value[k[:, None, None], i0[0][:, :, None], i1[0][:, None, :]]
+            return [np.einsum("nij,ni,nj->n", v, wx[a], wy[b]) for a, b in ((0, 0), (1, 0), (0, 1), (2, 0), (0, 2), (1, 1))]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for _ in range(max_iterations):
+                _, fx, fy, fxx, fyy, fxy = derivatives(x, y)
+                det = fxx*fyy-fxy**2
+                x = x - (fyy*fx-fxy*fy)/det
+                y = y - (fxx*fy-fxy*fx)/det
+                x = np.clip(np.nan_to_num(x, nan=x_axis[0]), x_axis[0], x_axis[-1])
+                y = np.clip(np.nan_to_num(y, nan=y_axis[0]), y_axis[0], y_axis[-1])
+
+        f, fx, fy, fxx, fyy, fxy = derivatives(x, y)
+        det = fxx*fyy-fxy**2
+
+        hx = x_axis[i+1]-x_axis[i]
+        hy = y_axis[j+1]-y_axis[j]
+        scale = np.abs(fxx)*hx+np.abs(fyy)*hy+np.abs(fxy)*(hx+hy)
+        valid = (x >= x_axis[i]-0.5*hx) & (x <= x_axis[i+1]+0.5*hx) & (y >= y_axis[j]-0.5*hy) & (y <= y_axis[j+1]+0.5*hy) \
+            & (np.hypot(fx, fy) <= 1.0e-6*scale) & (det != 0)
+
+        k, x, y, f, det = k[valid], x[valid], y[valid], f[valid], det[valid]
+
+        # remove duplicates: points converged from neighbouring cells share the nearest node
+        def nearest(axis, x):
+            p = np.clip(np.searchsorted(axis, x), 1, len(axis)-1)
+            return p - ((x-axis[p-1]) < (axis[p]-x))
+
+        key = np.stack([k, nearest(x_axis, x), nearest(y_axis, y)])
+        _, idx = np.unique(key, axis=1, return_index=True)
+
+        return k[idx], x[idx], y[idx], f[idx], det[idx]
+
+    def find_critical_points(self, value) -> Iterator[Tuple[float, float, float, float]]:
+        """
+            yield (x, y, value, det(Hessian)) of critical points of a 2-D field
+        """
+        _, x, y, f, det = self.critical_points(value)
+        yield from zip(x, y, f, det)
+
+    def contours(self, value: np.ndarray, levels: Sequence[float], /, center=None) -> CurvilinearMesh:
+        """
+            Closed contours of a 2-D field around `center`, one for each of `levels`,
+            packed into a CurvilinearMesh with uv=[levels, v]. The contours are ordered by increasing level,
+            i.e. uv[0] is the sorted `levels` (decreasing levels, e.g. psi, come back in reverse order).
+
+            center : (x,y), default is the O-point nearest to the middle of the mesh (magnetic axis)
+
+            Each contour is a periodic CubicSplineCurve parameterized by normalized chord length v in [0,1],
+            counter-clockwise, starting from the vertex on the ray theta=0 from `center`.
+        """
+        if self.ndims != 2:
+            raise NotImplementedError(f"ndims={self.ndims}")
+        value = np.asarray(value, dtype=float)
+        if value.shape != self.shape:
+            raise ValueError(f"{value.shape} {self.shape}")
+        levels = np.sort(np.asarray(levels, dtype=float).reshape(-1))
+        if np.any(np.diff(levels) <= 0):
+            raise ValueError(f"Levels should be distinct! {levels}")
+
+        x_axis, y_axis = self._dims
+
+        if center is None:
+            _, x, y, _, det = self.critical_points(value)
+            x, y = x[det > 0], y[det > 0]
+            if len(x) == 0:
+                raise RuntimeError(f"Can not find O-point!")
+            k = np.argmin(np.hypot(x-(x_axis[0]+x_axis[-1])*0.5, y-(y_axis[0]+y_axis[-1])*0.5))
+            center = (x[k], y[k])
+        xc, yc = center
+
+        # center in index space
+        ic = np.interp(xc, x_axis, np.arange(len(x_axis)))
+        jc = np.interp(yc, y_axis, np.arange(len(y_axis)))
+
+        surfs = []
+        for level in levels:
+            curve = None
+            for c in measure.find_contours(value, level):
+                if len(c) < 4 or np.any(c[0] != c[-1]):
+                    continue
+                # crossing number of the ray j=jc, i>ic
+                i0, j0 = c[:-1].T
+                i1, j1 = c[1:].T
+                cross = (j0 > jc) != (j1 > jc)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    ix = i0+(jc-j0)*(i1-i0)/(j1-j0)
+                if np.count_nonzero(cross & (ix > ic)) % 2 == 1:
+                    curve = c
+                    break
+            if curve is None:
+                raise RuntimeError(f"Can not find closed contour around ({xc},{yc}) at level={level}")
+
+            xy = np.stack([np.interp(curve[:, 0], np.arange(len(x_axis)), x_axis),
+                           np.interp(curve[:, 1], np.arange(len(y_axis)), y_axis)], axis=-1)[:-1]
+
+            # counter-clockwise, start from theta=0
+            x, y = xy.T
+            if np.dot(x, np.roll(y, -1))-np.dot(y, np.roll(x, -1)) < 0:
+                xy = xy[::-1]
+            xy = np.roll(xy, -np.argmin(np.abs(np.arctan2(xy[:, 1]-yc, xy[:, 0]-xc))), axis=0)
+
+            # drop repeated vertices
+            dl = np.hypot(*(np.roll(xy, -1, axis=0)-xy).T)
+            xy, dl = xy[dl > 0], dl[dl > 0]
+
+            u = np.concatenate([[0.0], np.cumsum(dl)])
+            surfs.append(CubicSplineCurve(np.vstack([xy, xy[:1]]), [u/u[-1]]))
+
+        num = max(len(surf.points()) for surf in surfs)
+        return CurvilinearMesh(surfs, [levels, np.linspace(0, 1, num)], cycle=[False, True])
+
     @ cached_property
     def dl(self):
-        dX = (np.roll(self.points[0], 1, axis=1) - np.roll(self.points[0], -1, axis=1))/2.0
-        dY = (np.roll(self.points[1], 1, axis=1) - np.roll(self.points[1], -1, axis=1))/2.0
+        X, Y = np.broadcast_arrays(*self.points)  # dense, also for sparse_xy
+        dX = (np.roll(X, 1, axis=1) - np.roll(X, -1, axis=1))/2.0
+        dY = (np.roll(Y, 1, axis=1) - np.roll(Y, -1, axis=1))/2.0
         return dX, dY
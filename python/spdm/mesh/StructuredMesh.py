@@ -1,10 +1,115 @@
-from typing import Callable, Iterator, Sequence, Type, Union
+from functools import cached_property
+from typing import Callable, Iterator, Sequence, Tuple, Type, Union
+
+import numpy as np
+from scipy import sparse
 
 from ..geometry.GeoObject import GeoObject
 from ..common.logger import logger
 from .Mesh import Mesh
 
 
+def _axis_weights(axis: np.ndarray, x: np.ndarray, method: str, order: int = 0, step: float = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Index and weight of the neighbouring nodes of points `x` on one axis.
+            order : order of derivative
+            step  : step of uniform axis, the node is located in O(1) instead of `searchsorted`
+        Return: idx, w  , shape=[len(x), 2] (linear) or [len(x), 4] (cubic)
+    """
+    n = len(axis)
+    if step is None:
+        pos = np.searchsorted(axis, x, side="right")-1
+    else:
+        pos = np.floor((x-axis[0])/step).astype(int)
+
+    if method == "linear":
+        idx = np.clip(pos, 0, n-2)
+        h = axis[idx+1]-axis[idx] if step is None else np.full(x.shape, step)
+        if order == 0:
+            t = (x-axis[idx])/h
+            w = [1.0-t, t]
+        elif order == 1:
+            w = [-1.0/h, 1.0/h]
+        else:
+            w = [np.zeros_like(h)]*2
+        return np.stack([idx, idx+1], axis=-1), np.stack(w, axis=-1)
+    elif method == "cubic":
+        # C1 cubic Hermite on the cell, nodal slopes from the 3-point (parabolic) derivative
+        if n < 3:
+            raise ValueError(f"Cubic interpolation needs at least 3 points on each axis, not {n}")
+        c = np.clip(pos, 0, n-2)
+        idx = np.stack([np.maximum(c-1, 0), c, c+1, np.minimum(c+2, n-1)], axis=-1)
+        x0, x1, x2, x3 = axis[idx].T
+        h = x2-x1
+        t = (x-x1)/h
+        zero = np.zeros(x.shape)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # slope at x1: centered on (x0, x1, x2), one-sided on (x1, x2, x3) at the lower edge
+            h0, h2 = x1-x0, x3-x2
+            a = np.where(c > 0,
+                         [-h/(h0*(h0+h)), (h-h0)/(h0*h), h0/(h*(h0+h)), zero],
+                         [zero, -(2*h+h2)/(h*(h+h2)), (h+h2)/(h*h2), -h/(h2*(h+h2))])
+            # slope at x2: centered on (x1, x2, x3), one-sided on (x0, x1, x2) at the upper edge
+            b = np.where(c < n-2,
+                         [zero, -h2/(h*(h+h2)), (h2-h)/(h*h2), h/(h2*(h+h2))],
+                         [h/(h0*(h0+h)), -(h0+h)/(h0*h), (h0+2*h)/(h*(h0+h)), zero])
+        if order == 0:
+            h00, h10, h01, h11 = 2*t**3-3*t**2+1, t**3-2*t**2+t, -2*t**3+3*t**2, t**3-t**2
+        elif order == 1:
+            h00, h10, h01, h11 = 6*t**2-6*t, 3*t**2-4*t+1, -6*t**2+6*t, 3*t**2-2*t
+        elif order == 2:
+            h00, h10, h01, h11 = 12*t-6, 6*t-4, -12*t+6, 6*t-2
+        elif order == 3:
+            h00, h10, h01, h11 = [np.full(x.shape, v) for v in (12.0, 6.0, -12.0, 6.0)]
+        else:
+            h00 = h10 = h01 = h11 = np.zeros(x.shape)
+        w = (h10*h)*a+(h11*h)*b
+        w[1] += h00
+        w[2] += h01
+        w = w.T
+        return idx, w*(h**(-order))[:, None]
+    else:
+        raise ValueError(f"Unknown interpolation method '{method}'")
+
+
+def _tensor_weights(axes: Sequence[np.ndarray], points: Sequence[np.ndarray], method: str,
+                    orders: Sequence[int] = None, steps: Sequence[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Tensor product of `_axis_weights`, flattened (C order) node index and weight of 1-D `points`.
+        Return: idx, w  , shape=[len(points[0]), 2**ndims] (linear) or [len(points[0]), 4**ndims] (cubic)
+    """
+    num = len(points[0])
+    orders = orders or [0]*len(axes)
+    steps = steps or [None]*len(axes)
+    idx = np.zeros([num, 1], dtype=int)
+    weight = np.ones([num, 1])
+    for d, x, order, step in zip(axes, points, orders, steps):
+        i, w = _axis_weights(d, x, method, order=order, step=step)
+        idx = (idx[:, :, None]*len(d)+i[:, None, :]).reshape(num, -1)
+        weight = (weight[:, :, None]*w[:, None, :]).reshape(num, -1)
+    return idx, weight
+
+
+def _dual_quadrature(axis: np.ndarray, order: int = 2, breaks: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+        Gauss-Legendre points of the control intervals of the nodes on one axis, node i owns
+        [ (axis[i-1]+axis[i])/2, (axis[i]+axis[i+1])/2 ] clipped to the axis. Intervals are also split at
+        the nodes and at `breaks`, so that piecewise polynomials with these knots are integrated exactly.
+        Return: x, w, owner
+    """
+    edges = np.concatenate([axis[:1], (axis[1:]+axis[:-1])*0.5, axis[-1:]])
+    cuts = [edges, axis]
+    if breaks is not None:
+        cuts.append(breaks[(breaks > axis[0]) & (breaks < axis[-1])])
+    cuts = np.unique(np.concatenate(cuts))
+    a, b = cuts[:-1], cuts[1:]
+    owner = np.clip(np.searchsorted(edges, (a+b)*0.5)-1, 0, len(axis)-1)
+    gx, gw = np.polynomial.legendre.leggauss(order)
+    x = ((a+b)*0.5)[:, None]+((b-a)*0.5)[:, None]*gx
+    w = ((b-a)*0.5)[:, None]*gw
+    return x.ravel(), w.ravel(), np.repeat(owner, order)
+
+
 class StructuredMesh(Mesh):
     def __init__(self, *args,  **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -19,14 +124,41 @@ class StructuredMesh(Mesh):
         return NotImplemented
 
     def find_critical_points(self, Z):
-        X, Y = self.points
-        xmin = X.min()
-        xmax = X.max()
-        ymin = Y.min()
-        ymax = Y.max()
-        dx = (xmax-xmin)/X.shape[0]
-        dy = (ymax-ymin)/X.shape[1]
-        yield from find_critical_points(self.interpolator(Z),  xmin, ymin, xmax, ymax, tolerance=[dx, dy])
+        raise NotImplementedError(f"{self.__class__.__name__}.find_critical_points")
+
+    @property
+    def parametric_axes(self) -> Sequence[np.ndarray]:
+        """ increasing axes of the parametric (logical) space """
+        return self._uv
+
+    def parametric_map(self, *uv: np.ndarray) -> Tuple[Sequence[np.ndarray], np.ndarray]:
+        """ physical coordinates of parametric points `uv`, and the Jacobian determinant of the map """
+        return NotImplemented
+
+    def control_volumes(self, order=2, breaks=None) -> Tuple[Sequence[np.ndarray], sparse.csr_matrix, np.ndarray]:
+        """
+            Quadrature of the control volumes of the mesh nodes (dual cells in parametric space).
+            breaks : knots (physical coordinates) of the integrand per axis, used only where the map is identity
+
+            Return: points , physical coordinates of the quadrature points, one flattened array per dimension
+                    average, sparse matrix shape=[mesh.size, num_of_points], rows sum to 1
+                    volume , shape=mesh.shape
+        """
+        breaks = breaks or [None]*self.rank
+        quad = [_dual_quadrature(d, order, b) for d, b in zip(self.parametric_axes, breaks)]
+        uv = np.meshgrid(*[q[0] for q in quad], indexing="ij")
+        w = np.prod(np.meshgrid(*[q[1] for q in quad], indexing="ij"), axis=0)
+        owner = np.ravel_multi_index(np.meshgrid(*[q[2] for q in quad], indexing="ij"), self.shape)
+
+        points, jac = self.parametric_map(*[u.ravel() for u in uv])
+        w = w.ravel()*np.abs(jac)
+        num = len(w)
+
+        volume = np.bincount(owner.ravel(), weights=w, minlength=int(np.prod(self.shape)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg = sparse.csr_matrix((np.nan_to_num(w/volume[owner.ravel()]), (owner.ravel(), np.arange(num))),
+                                    shape=(len(volume), num))
+        return points, avg, volume.reshape(self.shape)
 
     def sub_axis(self, axis=0) -> Iterator[GeoObject]:
         for idx in range(self.shape[axis]):
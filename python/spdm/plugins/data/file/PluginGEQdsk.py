@@ -1,62 +1,90 @@
+import argparse
 import collections
+import concurrent.futures
 import pathlib
 import pprint
+import re
+import time
+import typing
 from functools import cached_property
 
 import numpy as np
 from spdm.common.logger import logger
-from spdm.data.Node import Dict
+from spdm.data.Dict import Dict
 from spdm.data.Entry import Entry, _next_
 from spdm.data.File import File
 
 
+def _parse_fixed_width(buffer: np.ndarray, starts: np.ndarray, ends: np.ndarray, line: int, count: int,
+                       width: int = 16, per_line: int = 5):
+    """
+        Parse `count` fixed-width numbers written `per_line` per line, from line `line` of `buffer` (uint8 text,
+        Fortran 'D' exponents already replaced by 'E'). Fields are collected into one [count, width] byte array and
+        converted by one astype(float), so glued numbers (e.g. '1.0E+00-2.0E+00') are split by their columns.
+        Full lines with a constant stride are taken as a strided view of the buffer, other lines are gathered.
+        Return: values, index of the next line
+    """
+    num_lines = (count+per_line-1)//per_line
+    num_full = count//per_line
+    rows = slice(line, line+num_full)
+    stride = starts[line+1]-starts[line] if num_full > 0 else 0
+    if num_full > 1 and np.all(ends[rows]-starts[rows] >= per_line*width) and np.all(np.diff(starts[rows]) == stride):
+        s0 = starts[line]
+        full = buffer[s0:s0+num_full*stride].reshape(num_full, stride)[:, :per_line*width].reshape(-1, width)
+        n = np.arange(num_full*per_line, count)
+    else:
+        full = np.zeros([0, width], dtype=np.uint8)
+        n = np.arange(count)
+
+    row = line + n//per_line
+    idx = (starts[row] + (n % per_line)*width)[:, None] + np.arange(width)
+    rest = buffer[np.minimum(idx, len(buffer)-1)]
+    rest[idx >= ends[row][:, None]] = ord(" ")
+
+    chars = np.concatenate([full, rest]) if len(rest) > 0 else np.ascontiguousarray(full)
+    return chars.view(f"S{width}").ravel().astype(float), line+num_lines
+
+
 def sp_read_geqdsk(file):
     """
     :param file: input file / file path
     :return: profile object
+
+    The header line is parsed as text, the rest of the file is read once and every data block is parsed
+    with `_parse_fixed_width`.
     """
 
-    description = file.read(48)
-    idum = int(file.read(4))
-    nw = int(file.read(4))
-    nh = int(file.read(4))
-    file.readline()
-
-    rdim = float(file.read(16))
-    zdim = float(file.read(16))
-    rcentr = float(file.read(16))
-    rleft = float(file.read(16))
-    zmid = float(file.read(16))
-    file.readline()
-    rmaxis = float(file.read(16))
-    zmaxis = float(file.read(16))
-    simag = float(file.read(16))
-    sibry = float(file.read(16))
-    bcentr = float(file.read(16))
-    file.readline()
-    current = float(file.read(16))
-    simag = float(file.read(16))
-    xdum = float(file.read(16))
-    rmaxis = float(file.read(16))
-    xdum = float(file.read(16))
-    file.readline()
-
-    zmaxis = float(file.read(16))
-    xdum = float(file.read(16))
-    sibry = float(file.read(16))
-    xdum = float(file.read(16))
-    xdum = float(file.read(16))
-    file.readline()
+    header = file.readline()
+    text = file.read()
+    if isinstance(header, bytes):
+        header = header.decode("ascii")
+    if isinstance(text, str):
+        text = text.encode("ascii")
+
+    description = header[:48]
+    idum = int(header[48:52])
+    nw = int(header[52:56])
+    nh = int(header[56:60])
+
+    buffer = np.frombuffer(text, dtype=np.uint8).copy()
+    buffer[(buffer == ord("D")) | (buffer == ord("d"))] = ord("E")
+    buffer[buffer == ord("\r")] = ord(" ")
+    ends = np.flatnonzero(buffer == ord("\n"))
+    starts = np.concatenate([[0], ends+1])
+    ends = np.concatenate([ends, [len(buffer)]])
+
+    line = 0
 
     def _read_data(count, width=16):
-        data = []
-        for n in range(count):
-            data.append(float(file.read(width)))
-            if n >= count - 1 or ((n + 1) % 5 == 0):
-                file.readline()
-        data = np.asarray(data)
+        nonlocal line
+        data, line = _parse_fixed_width(buffer, starts, ends, line, count, width)
         return data
 
+    (rdim, zdim, rcentr, rleft, zmid,
+     rmaxis, zmaxis, simag, sibry, bcentr,
+     current, simag, xdum, rmaxis, xdum,
+     zmaxis, xdum, sibry, xdum, xdum) = _read_data(20)
+
     #
     fpol = _read_data(nw)
     pres = _read_data(nw)
@@ -68,13 +96,14 @@ def sp_read_geqdsk(file):
     qpsi = _read_data(nw)
 
     try:
-        nbbs = int(file.read(5))
-        limitr = int(file.read(5))
-        file.readline()
+        sizes = buffer[starts[line]:ends[line]].tobytes()
+        nbbs = int(sizes[0:5])
+        limitr = int(sizes[5:10])
+        line += 1
 
         bbsrz = _read_data(nbbs * 2).reshape([nbbs, 2])
         limrz = _read_data(limitr * 2).reshape([limitr, 2])
-    except:
+    except (ValueError, IndexError):
         nbbs = 0
         limitr = 0
         bbsrz = None
@@ -113,6 +142,20 @@ def sp_read_geqdsk(file):
     return data
 
 
+def _format_data(d, fmt: str = "%16.9e", per_line: int = 5) -> str:
+    """
+        Format a block of numbers, `per_line` per line and a newline after the last one.
+        The full lines are formatted by one `%` with a precomputed format string, then the partial last line.
+    """
+    d = np.asarray(d).ravel().tolist()
+    num_full = len(d)//per_line*per_line
+    line = fmt*per_line+"\n"
+    text = (line*(num_full//per_line)) % tuple(d[:num_full])
+    if num_full < len(d):
+        text += (fmt*(len(d)-num_full)+"\n") % tuple(d[num_full:])
+    return text
+
+
 def sp_write_geqdsk(p, file):
     """
     :param profile: object
@@ -134,22 +177,17 @@ def sp_write_geqdsk(p, file):
     file.write("%16.9e%16.9e%16.9e%16.9e%16.9e\n" %
                (p["zmaxis"], 0, p["sibry"], 0, 0))
 
-    def _write_data(d):
-        count = len(d)
-        for n in range(count):
-            file.write("%16.9e" % d[n])
-            if (n == count - 1) or ((n + 1) % 5 == 0):
-                file.write('\n')
-
-    _write_data(p["fpol"])
-    _write_data(p["pres"])
-    _write_data(p["ffprim"])
-    _write_data(p["pprim"])
-    _write_data(p["psirz"].reshape([nw * nh]))
-    _write_data(p["qpsi"])
-    file.write("%5i%5i\n" % (p["bbsrz"].shape[0], p["limrz"].shape[0]))
-    _write_data(p["bbsrz"].reshape([p["bbsrz"].size]))
-    _write_data(p["limrz"].reshape([p["limrz"].size]))
+    file.write("".join([
+        _format_data(p["fpol"]),
+        _format_data(p["pres"]),
+        _format_data(p["ffprim"]),
+        _format_data(p["pprim"]),
+        _format_data(p["psirz"].reshape([nw * nh])),
+        _format_data(p["qpsi"]),
+        "%5i%5i\n" % (p["bbsrz"].shape[0], p["limrz"].shape[0]),
+        _format_data(p["bbsrz"].reshape([p["bbsrz"].size])),
+        _format_data(p["limrz"].reshape([p["limrz"].size])),
+    ]))
 
     return
 
@@ -230,56 +268,200 @@ def sp_imas_equilibrium_to_geqdsk(eq, nw=125, nh=125):
     }
 
 
+def sp_geqdsk_to_imas_time_slice(geqdsk) -> typing.Dict[str, typing.Any]:
+    """ IMAS equilibrium time slice as a flat mapping of dotted path -> value """
+    nw = geqdsk["nw"]
+    nh = geqdsk["nh"]
+    rmin = geqdsk["rleft"]
+    rmax = geqdsk["rleft"] + geqdsk["rdim"]
+    zmin = geqdsk["zmid"] - geqdsk["zdim"]/2
+    zmax = geqdsk["zmid"] + geqdsk["zdim"]/2
+
+    return {
+        "vacuum_toroidal_field.r0": geqdsk["rcentr"],
+        "vacuum_toroidal_field.b0": geqdsk["bcentr"],
+
+        # rleft = 0.0
+        "global_quantities.magnetic_axis.r": geqdsk["rmaxis"],
+        "global_quantities.magnetic_axis.z": geqdsk["zmaxis"],
+        # "global_quantities.magnetic_axis.b_field_tor": geqdsk["bcentr"],
+        "global_quantities.psi_axis": geqdsk["simag"],
+        "global_quantities.psi_boundary": geqdsk["sibry"],
+        "global_quantities.ip": geqdsk["current"],
+
+        # boundary
+        "boundary.outline.r": geqdsk["bbsrz"][:, 0],
+        "boundary.outline.z": geqdsk["bbsrz"][:, 1],
+
+        "profiles_2d.grid_type": "rectangular",
+        "profiles_2d.grid_index": 1,
+        "profiles_2d.grid.dim1": np.linspace(rmin, rmax, nw),
+        "profiles_2d.grid.dim2": np.linspace(zmin, zmax, nh),
+        "profiles_2d.psi": geqdsk["psirz"].T,
+
+        # profile
+        "profiles_1d.f": geqdsk["fpol"],
+        "profiles_1d.f_df_dpsi": geqdsk["ffprim"],
+        "profiles_1d.pressure": geqdsk["pres"],
+        "profiles_1d.dpressure_dpsi": geqdsk["pprim"],
+        "profiles_1d.q": geqdsk["qpsi"],
+        "profiles_1d.psi": np.linspace(geqdsk["simag"], geqdsk["sibry"], nw),
+        "profiles_1d.grid.r0": geqdsk["rcentr"],
+        "profiles_1d.grid.b0": geqdsk["bcentr"],
+        "profiles_1d.grid.psi_norm": np.linspace(0, 1.0,  nw),
+        "profiles_1d.grid.psi_axis": geqdsk["simag"],
+        "profiles_1d.grid.psi_boundary": geqdsk["sibry"],
+    }
+
+
 def sp_geqdsk_to_imas_equilibrium(geqdsk, eq: Dict = None) -> Dict:
     if eq is None:
         eq = Dict()
 
     # eq.time = 0.0
-    eq["vacuum_toroidal_field.r0"] = geqdsk["rcentr"]
-    eq["vacuum_toroidal_field.b0"] = geqdsk["bcentr"]
+    return eq.update(sp_geqdsk_to_imas_time_slice(geqdsk))
 
-    # rleft = 0.0
-    eq["global_quantities.magnetic_axis.r"] = geqdsk["rmaxis"]
-    eq["global_quantities.magnetic_axis.z"] = geqdsk["zmaxis"]
-    # eq["global_quantities.magnetic_axis.b_field_tor"] = geqdsk["bcentr"]
-    eq["global_quantities.psi_axis"] = geqdsk["simag"]
-    eq["global_quantities.psi_boundary"] = geqdsk["sibry"]
-    eq["global_quantities.ip"] = geqdsk["current"]
 
-    # boundary
+def _geqdsk_time(path: pathlib.Path) -> float:
+    """ time [s] from the EFIT file name 'g<shot>.<time in ms>', nan if the name does not match """
+    m = re.fullmatch(r"g(\d+)\.(\d+)(_\d+)?", path.name)
+    return float(m.group(2))*1.0e-3 if m is not None else np.nan
 
-    eq["boundary.outline.r"] = geqdsk["bbsrz"][:, 0]
-    eq["boundary.outline.z"] = geqdsk["bbsrz"][:, 1]
 
-    nw = geqdsk["nw"]
-    nh = geqdsk["nh"]
-    rmin = geqdsk["rleft"]
-    rmax = geqdsk["rleft"] + geqdsk["rdim"]
-    zmin = geqdsk["zmid"] - geqdsk["zdim"]/2
-    zmax = geqdsk["zmid"] + geqdsk["zdim"]/2
+def _read_geqdsk_time_slice(path):
+    """ worker of the batch converter: (path, time, time slice, file size), time slice is None and size is 0 on failure """
+    path = pathlib.Path(path)
+    try:
+        size = path.stat().st_size
+        with open(path) as fid:
+            res = sp_geqdsk_to_imas_time_slice(sp_read_geqdsk(fid))
+    except Exception as error:
+        logger.warning(f"Skip {path}: {error}")
+        res = None
+        size = 0
+    return path, _geqdsk_time(path), res, size
 
-    eq["profiles_2d.grid_type"] = "rectangular"
-    eq["profiles_2d.grid_index"] = 1
-    eq["profiles_2d.grid.dim1"] = np.linspace(rmin, rmax, nw)
-    eq["profiles_2d.grid.dim2"] = np.linspace(zmin, zmax, nh)
-    eq["profiles_2d.psi"] = geqdsk["psirz"].T
 
-    # profile
-    eq["profiles_1d.f"] = geqdsk["fpol"]
-    eq["profiles_1d.f_df_dpsi"] = geqdsk["ffprim"]
-    eq["profiles_1d.pressure"] = geqdsk["pres"]
-    eq["profiles_1d.dpressure_dpsi"] = geqdsk["pprim"]
-    eq["profiles_1d.q"] = geqdsk["qpsi"]
-    eq["profiles_1d.psi"] = np.linspace(geqdsk["simag"], geqdsk["sibry"], nw)
-    eq["profiles_1d.grid"] = {
-        "r0": geqdsk["rcentr"],
-        "b0": geqdsk["bcentr"],
-        "psi_norm": np.linspace(0, 1.0,  nw),
-        "psi_axis": geqdsk["simag"],
-        "psi_boundary": geqdsk["sibry"],
-    }
+def _stack_time_slices(slices: typing.Sequence[typing.Mapping]) -> typing.Dict[str, typing.Any]:
+    """
+        Stack time slices into columns with a leading time axis.
+        Strings must be the same in all slices and stay scalar. Arrays of different lengths (e.g. boundary outline)
+        are padded with nan to the longest one.
+    """
+    columns = {}
+    for key in slices[0]:
+        values = [d[key] for d in slices]
+        if isinstance(values[0], str):
+            if any(v != values[0] for v in values):
+                raise ValueError(f"'{key}' differs between time slices!")
+            columns[key] = values[0]
+            continue
+        values = [np.asarray(v) for v in values]
+        shape = np.max([v.shape for v in values], axis=0) if values[0].ndim > 0 else ()
+        if any(v.shape != tuple(shape) for v in values):
+            res = np.full([len(values), *shape], np.nan)
+            for idx, v in enumerate(values):
+                res[(idx, *[slice(0, n) for n in v.shape])] = v
+            columns[key] = res
+        else:
+            columns[key] = np.stack(values)
+    return columns
+
+
+def _read_geqdsk_batch(files: typing.Sequence, /, max_workers: int = None, chunksize: int = 4,
+                       report_interval: float = 5.0) -> typing.Tuple[np.ndarray, typing.List[typing.Dict[str, typing.Any]]]:
+    """
+        Read g-files with a process pool.
+
+        :param files: g-file paths, time is taken from the file name 'g<shot>.<time in ms>'. If any name does not
+                      match, the time of every slice is its index in `files` (file order).
+        :param max_workers: number of processes, default is os.cpu_count(); 1 reads in this process
+        :param report_interval: seconds between progress reports
+        :return: time, shape=[num_of_slices], and time slices (see sp_geqdsk_to_imas_time_slice), sorted by time
+    """
+    files = [pathlib.Path(f) for f in files]
+    if len(files) == 0:
+        raise ValueError("No g-file to convert!")
+
+    start = last_report = time.perf_counter()
+    num_of_bytes = 0
+    results = []
+
+    if max_workers == 1 or len(files) == 1:
+        executor = None
+        tasks = map(_read_geqdsk_time_slice, files)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+        tasks = executor.map(_read_geqdsk_time_slice, files, chunksize=chunksize)
+
+    try:
+        for idx, (path, t, res, size) in enumerate(tasks):
+            num_of_bytes += size
+            if res is not None:
+                results.append((idx, t, res))
+            now = time.perf_counter()
+            if now - last_report >= report_interval:
+                last_report = now
+                logger.info(f"Read {idx+1}/{len(files)} g-files, {(idx+1)/(now-start):.1f} files/s,"
+                            f" {num_of_bytes/(now-start)/1.0e6:.1f} MB/s")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if len(results) == 0:
+        raise RuntimeError(f"Failed to read all {len(files)} g-files!")
+
+    elapsed = time.perf_counter()-start
+    logger.info(f"Read {len(results)}/{len(files)} g-files in {elapsed:.2f}s, {len(files)/elapsed:.1f} files/s,"
+                f" {num_of_bytes/elapsed/1.0e6:.1f} MB/s")
+
+    if any(np.isnan(t) for _, t, _ in results):
+        logger.warning("Not all file names carry a time, use file order as time!")
+        results = [(idx, float(idx), res) for idx, _, res in results]
+
+    results.sort(key=lambda d: d[1])
+    return np.asarray([t for _, t, _ in results]), [d for _, _, d in results]
+
+
+def sp_read_geqdsk_batch(files: typing.Sequence, /, **kwargs) -> typing.Tuple[np.ndarray, typing.Dict[str, typing.Any]]:
+    """
+        Read g-files with a process pool and stack them into time-sliced columns, see _read_geqdsk_batch for `kwargs`.
+
+        :return: time, shape=[num_of_slices], and columns {dotted path: value with a leading time axis}, sorted by time
+    """
+    t, slices = _read_geqdsk_batch(files, **kwargs)
+    return t, _stack_time_slices(slices)
 
-    return eq
+
+def sp_convert_geqdsk_batch(files: typing.Sequence, output, /, prefix: str = "equilibrium", **kwargs) -> int:
+    """
+        Convert g-files to one IMAS equilibrium in HDF5. '<prefix>/time_slice' is written in the columnar list layout
+        of the HDF5 plugin (h5_put_columns), e.g. 'time_slice/profiles_2d/psi' is one dataset of shape
+        [num_of_slices, nw, nh], boundary outlines are ragged datasets. H5Entry reads it back as a list of time slices.
+        All datasets are written in one pass after the files are read, see _read_geqdsk_batch for `kwargs`.
+
+        :return: number of time slices
+    """
+    import h5py
+    from spdm.plugins.data.file.PluginHDF5 import (h5_leaf_columns,
+                                                   h5_put_columns)
+
+    t, slices = _read_geqdsk_batch(files, **kwargs)
+
+    vacuum = [k for k in slices[0] if k.startswith("vacuum_toroidal_field.")]
+    columns = h5_leaf_columns([{k.replace(".", "/"): v for k, v in d.items() if k not in vacuum} for d in slices])
+    if columns is None:
+        raise ValueError("Time slices are not homogeneous!")
+
+    start = time.perf_counter()
+    with h5py.File(output, mode="w") as fid:
+        grp = fid.require_group(prefix)
+        grp.create_dataset("time", data=t)
+        for key in vacuum:
+            grp.create_dataset(key.replace(".", "/"), data=np.asarray([d[key] for d in slices]))
+        h5_put_columns(grp.require_group("time_slice"), columns, len(t))
+    logger.info(f"Write {len(t)} time slices to {output} in {time.perf_counter()-start:.2f}s")
+    return len(t)
 
 
 class GEQdskFile(File):
@@ -299,7 +481,7 @@ class GEQdskFile(File):
             self.save(self.path)
 
     def read(self, lazy=False) -> Entry:
-        return sp_geqdsk_to_imas_equilibrium(sp_read_geqdsk(self._fid)).entry
+        return sp_geqdsk_to_imas_equilibrium(sp_read_geqdsk(self._fid))._entry
 
     def write(self, d):
         geqdsk = sp_imas_equilibrium_to_geqdsk(d)
@@ -307,3 +489,18 @@ class GEQdskFile(File):
 
 
 __SP_EXPORT__ = GEQdskFile
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert G-EQDSK files to one IMAS equilibrium in HDF5.")
+    parser.add_argument("output", help="output HDF5 file")
+    parser.add_argument("inputs", nargs="+", help="g-files or directories of g-files (g*)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of processes (default: all cpus)")
+    parser.add_argument("--prefix", default="equilibrium", help="HDF5 group of the equilibrium")
+    args = parser.parse_args()
+
+    files = []
+    for p in map(pathlib.Path, args.inputs):
+        files.extend(sorted(f for f in p.glob("g*") if f.is_file()) if p.is_dir() else [p])
+
+    sp_convert_geqdsk_batch(files, args.output, prefix=args.prefix, max_workers=args.jobs)
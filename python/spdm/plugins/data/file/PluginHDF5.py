@@ -1,11 +1,13 @@
 # from spdm.data.Collection import FileCollection
 import collections
 import pathlib
-from typing import Any, Dict
+from typing import Any, Dict, Mapping, Sequence
 
 import h5py
 import numpy
+from spdm.common.tags import _undefined_
 from spdm.data.Entry import Entry
+from spdm.data.Path import Path
 from spdm.data.File import File
 from spdm.common.logger import logger
 
@@ -27,7 +29,125 @@ def h5_require_group(grp, path):
     return grp
 
 
-def h5_put_value(grp, path, value):
+def _h5_flatten(d: collections.abc.Mapping, prefix: str = "", res: dict = None) -> dict:
+    """ nested dict -> {'a/b/c': leaf}, None if a key can not be an HDF5 name """
+    res = {} if res is None else res
+    for k, v in d.items():
+        if not isinstance(k, str) or k == "" or "/" in k or k.startswith("__"):
+            return None
+        elif isinstance(v, collections.abc.Mapping):
+            if _h5_flatten(v, f"{prefix}{k}/", res) is None:
+                return None
+        else:
+            res[prefix+k] = v
+    return res
+
+
+def _h5_columns(value: list) -> Dict[str, Any]:
+    """
+        Columns of a homogeneous list of dicts: all elements have the same leaf paths, and each leaf is a string, or
+        numbers/arrays of one ndim. Return {leaf path: (values, shapes)}, `shapes` is None unless the column is ragged.
+        Return None if the list is not homogeneous.
+    """
+    if len(value) == 0 or not all(isinstance(v, collections.abc.Mapping) for v in value):
+        return None
+    return h5_leaf_columns([_h5_flatten(v) for v in value])
+
+
+def h5_leaf_columns(leaves: Sequence[Mapping[str, Any]]) -> Dict[str, Any]:
+    """ columns of flattened elements {'a/b/c': leaf}, see _h5_columns. Return None if the elements are not homogeneous. """
+    if any(d is None or d.keys() != leaves[0].keys() for d in leaves):
+        return None
+
+    columns = {}
+    for key in leaves[0]:
+        values = [d[key] for d in leaves]
+        if all(isinstance(v, str) for v in values):
+            columns[key] = (numpy.array(values, dtype=h5py.string_dtype()), None)
+            continue
+        values = [numpy.asarray(v) for v in values]
+        if any(v.dtype.kind not in "biuf" or v.ndim != values[0].ndim for v in values):
+            return None
+        shapes = numpy.asarray([v.shape for v in values], dtype=int).reshape(len(values), -1)
+        if numpy.all(shapes == shapes[0]):
+            columns[key] = (numpy.stack(values), None)
+        else:
+            dtype = numpy.result_type(*values)
+            data = numpy.empty(len(values), dtype=object)
+            data[:] = [v.ravel().astype(dtype) for v in values]
+            columns[key] = (data, shapes)
+    return columns
+
+
+def h5_put_columns(grp, columns: Dict[str, Any], length: int):
+    """
+        Columnar layout of a list of dicts: one dataset per leaf with a leading index axis.
+        Ragged leaves are variable-length datasets of the flattened values, with their shapes in '__shape__<leaf>'.
+    """
+    grp.attrs["__is_list__"] = True
+    grp.attrs["__columnar__"] = True
+    grp.attrs["__length__"] = length
+    for key, (data, shapes) in columns.items():
+        if shapes is None:
+            grp.create_dataset(key, data=data)
+        else:
+            dset = grp.create_dataset(key, shape=[length], dtype=h5py.vlen_dtype(data[0].dtype))
+            dset[...] = data
+            dset.attrs["__ragged__"] = True
+            parent, _, name = key.rpartition("/")
+            grp.create_dataset(f"{parent}/__shape__{name}" if parent else f"__shape__{name}", data=shapes)
+
+
+def _h5_column(dset, rows=None):
+    """ elements `rows` (int, slice or None for all, a tuple selection if not ragged) of a column of a columnar list """
+    rows = slice(None) if rows is None else rows
+    if dset.attrs.get("__ragged__", False):
+        name = dset.name.rpartition("/")[-1]
+        data = dset[rows]
+        shapes = dset.parent[f"__shape__{name}"][rows]
+        if shapes.ndim == 1:
+            return data.reshape(shapes)
+        return [d.reshape(s) for d, s in zip(data, shapes)]
+    else:
+        return _h5_read(dset, rows)
+
+
+def _h5_read_rows(grp, rows=None, length: int = None):
+    """
+        elements `rows` of a columnar list (or of a group inside it): a dict for an int, else a list of dicts
+        length: number of elements of the list, default is the '__length__' of `grp`
+    """
+    if length is None:
+        length = int(grp.attrs["__length__"])
+    columns = {}
+
+    def visit(name, obj):
+        if isinstance(obj, h5py.Dataset) and not name.rpartition("/")[-1].startswith("__"):
+            columns[name] = _h5_column(obj, rows)
+
+    grp.visititems(visit)
+
+    def unflatten(leaves: dict) -> dict:
+        res = {}
+        for key, v in leaves.items():
+            *parents, name = key.split("/")
+            d = res
+            for p in parents:
+                d = d.setdefault(p, {})
+            d[name] = v
+        return res
+
+    if isinstance(rows, (int, numpy.integer)):
+        return unflatten(columns)
+    num = len(range(length)[slice(None) if rows is None or rows is Ellipsis else rows])
+    return [unflatten({k: v[idx] for k, v in columns.items()}) for idx in range(num)]
+
+
+def h5_put_value(grp, path, value, columnar=False):
+    """
+        columnar: store homogeneous lists of dicts in the columnar layout (h5_put_columns),
+                  otherwise (default) every element is a group '__index__N'
+    """
     res = None
     if path is None:
         path = []
@@ -37,7 +157,7 @@ def h5_put_value(grp, path, value):
     if isinstance(value, collections.abc.Mapping):
         grp = h5_require_group(grp, path)
         for k, v in value.items():
-            h5_put_value(grp, [k], v)
+            h5_put_value(grp, [k], v, columnar=columnar)
     elif len(path) == 0:
         raise KeyError(f"Empty path!")
     else:
@@ -51,18 +171,23 @@ def h5_put_value(grp, path, value):
         if path != '' and path in grp.keys():
             del grp[path]
 
-        if type(value) is list:
-            array_value = numpy.array(value)
+        columns = _h5_columns(value) if columnar and type(value) is list else None
+
+        if columns is not None:
+            h5_put_columns(grp.require_group(path), columns, len(value))
+        elif type(value) is list:
+            array_value = numpy.array(value, dtype=object) if any(
+                isinstance(v, collections.abc.Mapping) for v in value) else numpy.array(value)
 
             if array_value.dtype.type is numpy.object_:
-                grp = h5_require_group(grp, path)
+                grp = h5_require_group(grp, [path])
 
                 grp.attrs["__is_list__"] = True
 
                 for idx, v in enumerate(value):
-                    h5_put_value(grp, idx, v)
+                    h5_put_value(grp, idx, v, columnar=columnar)
 
-            elif array_value.dtype.type is numpy.unicode_:
+            elif array_value.dtype.type is numpy.str_:
                 # h5py does not support unicode string.
                 array_value = array_value.astype(h5py.special_dtype(vlen=str))
                 h5_put_value(grp, path, array_value)
@@ -76,18 +201,58 @@ def h5_put_value(grp, path, value):
     return res
 
 
-def h5_get_value(obj, path=None, projection=None):
+def _h5_read(dset, selection=()):
+    """ read `selection` of a dataset as a hyperslab, strings are decoded """
+    if h5py.check_string_dtype(dset.dtype) is not None:
+        dset = dset.asstr()
+    return dset[selection]
+
+
+def _h5_selection(path) -> tuple:
+    """ trailing path items (int, slice, Ellipsis or tuple of them) as one numpy/HDF5 selection """
+    selection = []
+    for p in path:
+        selection.extend(p if isinstance(p, tuple) else [p])
+    return tuple(selection)
+
+
+def h5_get_value(obj, path=None, projection=None, lazy=False):
+    """
+        lazy=False: datasets are read into memory
+        lazy=True : datasets are returned as H5Entry handles, nothing is read until they are sliced or converted
+
+        Path traversal stops at the dataset, the rest of the path (e.g. [..., "psi", 0, slice(0,10)]) is a selection
+        and is read as an HDF5 hyperslab, only the selected elements are read from the file.
+    """
     if obj is None:
         raise RuntimeError("None group")
 
     prefix = []
+    columnar = False  # inside a columnar list
+    rows = None  # selected elements of the columnar list, None is all of them
+    length = None  # number of elements of the columnar list
     if path is not None:
-        for p in path:
-            if isinstance(p, str):
-                pass
+        for idx, p in enumerate(path):
+            if isinstance(obj, h5py.Dataset) and columnar:
+                selection = _h5_selection(path[idx:])
+                if not obj.attrs.get("__ragged__", False):
+                    # element and selection in one hyperslab
+                    return _h5_column(obj, (slice(None) if rows is None else rows, *selection))
+                value = _h5_column(obj, rows)
+                return value[selection] if isinstance(rows, (int, numpy.integer)) else [v[selection] for v in value]
+            elif isinstance(obj, h5py.Dataset):
+                return _h5_read(obj, _h5_selection(path[idx:]))
+            elif not isinstance(obj, h5py.Group):
+                return numpy.asarray(obj)[_h5_selection(path[idx:])]
+            elif obj.attrs.get("__columnar__", False) and rows is None:
+                columnar = True
+                length = int(obj.attrs["__length__"])
+                if not isinstance(p, str):
+                    rows = p % length if isinstance(p, int) else p
+                    continue
             elif isinstance(p, int):
                 if p < 0:
-                    num = len(grp)
+                    num = len(obj)
                     p = p % num
                 p = f"__index__{p}"
 
@@ -100,24 +265,34 @@ def h5_get_value(obj, path=None, projection=None):
             else:
                 raise KeyError(f"Can not find element at {'/'.join(prefix)} !")
 
+    if columnar:
+        if isinstance(obj, h5py.Group):
+            return _h5_read_rows(obj, rows, length)
+        elif rows is None and lazy and not obj.attrs.get("__ragged__", False):
+            return H5Entry(obj)
+        else:
+            return _h5_column(obj, rows)
+    elif isinstance(obj, h5py.Group) and obj.attrs.get("__columnar__", False):
+        return _h5_read_rows(obj)
+
     if projection is None:
         if isinstance(obj, h5py.Group):
             if obj.attrs.get("__is_list__", False):
-                res = [h5_get_value(obj[k]) for k in obj]
+                res = [h5_get_value(obj[k], lazy=lazy) for k in obj]
             else:
                 res = {**(h5_get_value(obj.attrs)), **
-                       {k: h5_get_value(obj[k]) for k in obj}}
+                       {k: h5_get_value(obj[k], lazy=lazy) for k in obj}}
         elif isinstance(obj, h5py.AttributeManager):
             res = {k: h5_get_value(obj[k])
                    for k in obj if not k.startswith("__")}
         elif isinstance(obj, h5py.Dataset):
-            res = obj[:]
+            res = H5Entry(obj) if lazy else _h5_read(obj)
         else:
             res = obj
     elif isinstance(projection, str):
         if isinstance(obj, h5py.Group):
             res = h5_get_value(obj.attrs, projection) or h5_get_value(
-                obj.get(projection, None))
+                obj.get(projection, None), lazy=lazy)
         elif isinstance(obj, h5py.AttributeManager):
             res = h5_get_value(obj.get(projection, None))
 
@@ -126,12 +301,12 @@ def h5_get_value(obj, path=None, projection=None):
             res = []
         else:
             res = {**h5_get_value(obj.attrs, projection),
-                   **{k: h5_get_value(obj[k]) for k, v in projection.items() if v > 0 and k in obj}}
+                   **{k: h5_get_value(obj[k], lazy=lazy) for k, v in projection.items() if v > 0 and k in obj}}
     elif isinstance(obj, h5py.AttributeManager):
         res = {k: h5_get_value(obj[k])
                for k, v in projection.items() if v > 0 and k in obj}
     elif isinstance(obj, h5py.Dataset):
-        res = obj[:]
+        res = H5Entry(obj) if lazy else _h5_read(obj)
     else:
         res = obj
 
@@ -143,28 +318,90 @@ def h5_dump(grp):
 
 
 class H5Entry(Entry):
+    """
+        Entry of an HDF5 group or dataset. Reads are lazy: `get` returns H5Entry handles for datasets and
+        pushes int/slice path items down as hyperslab reads. A dataset handle has shape/dtype, is sliced with [] and
+        is read in full by np.asarray.
+    """
 
     def __init__(self, holder, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.holder = holder
 
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} holder={self.holder.name} path={self._path} />"
+
+    @staticmethod
+    def _normalize_path(path) -> list:
+        if path is None:
+            return []
+        elif not isinstance(path, (list, tuple)):
+            path = [path]
+        return sum([p.split(Path.SEPERATOR) if isinstance(p, str) else [p] for p in path], [])
+
+    def child(self, *args) -> Entry:
+        return H5Entry(self.holder, None, list(self._path)+H5Entry._normalize_path(list(args)))
+
     def copy(self, other):
         if isinstance(other, Entry):
             other = other.entry.__real_value__()
         self.put(None, other)
 
-    def put(self, path, value, *args, **kwargs):
-        return h5_put_value(self.holder, path, value)
+    def put(self, path, value, *args, columnar=False, **kwargs):
+        return h5_put_value(self.holder, path, value, columnar=columnar)
+
+    def get(self, path=[], projection=None, *args, lazy=True, **kwargs):
+        return h5_get_value(self.holder, list(self._path)+H5Entry._normalize_path(path), projection=projection, lazy=lazy)
 
-    def get(self, path=[], projection=None, *args, **kwargs):
-        return h5_get_value(self.holder, path, projection=projection)
+    def get_value(self, default=_undefined_, lazy=True, setdefault=False):
+        try:
+            return self.get([], lazy=lazy)
+        except KeyError:
+            if default is _undefined_:
+                raise
+            return default
 
     def dump(self):
-        return h5_dump(self.holder)
+        return h5_get_value(self.holder, list(self._path))
 
     def iter(self,  path, *args, **kwargs):
         raise NotImplementedError()
 
+    @property
+    def _target(self):
+        """ h5py object at the path of this entry, or the value read if the path selects a hyperslab """
+        path = list(self._path)
+        if len(path) == 0:
+            return self.holder
+        elif all(isinstance(p, str) for p in path):
+            return self.holder["/".join(path)]
+        res = h5_get_value(self.holder, path, lazy=True)
+        return res.holder if isinstance(res, H5Entry) and len(res._path) == 0 else res
+
+    @property
+    def shape(self) -> tuple:
+        return self._target.shape
+
+    @property
+    def dtype(self):
+        return self._target.dtype
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def __len__(self) -> int:
+        return len(self._target)
+
+    def __getitem__(self, key):
+        return self.get([key])
+
+    def __array__(self, dtype=None, copy=None):
+        target = self._target
+        if isinstance(target, h5py.Group):
+            raise TypeError(f"{target.name} is not a dataset!")
+        return numpy.asarray(self.get([], lazy=False), dtype=dtype)
+
 
 class H5File(File):
     def __init__(self,  *args,  **kwargs):
@@ -1,3 +1,6 @@
+import collections
+import threading
+import weakref
 from typing import Type
 import numpy as np
 from ..common.logger import logger
@@ -15,6 +18,64 @@ def float_unique(d: np.ndarray, x_min=-np.inf, x_max=np.inf) -> np.ndarray:
     return d[tag]
 
 
+_axis_lock = threading.Lock()
+
+_axis_registry = weakref.WeakValueDictionary()
+
+_merged_axis_cache = collections.OrderedDict()
+
+MERGED_AXIS_CACHE_SIZE = 256
+
+
+def intern_axis(d: np.ndarray) -> np.ndarray:
+    """
+        Return the registered array with the same content as `d`, or register a read-only copy of `d`.
+        Equal axes share one array, so that `is` checks and `merge_axis` cache hit.
+        Arrays are held by weak reference,  an axis is dropped when no Function uses it.
+    """
+    if not isinstance(d, np.ndarray) or d.ndim != 1:
+        return d
+    key = (d.dtype.str, d.shape, hash(d.tobytes()))
+    with _axis_lock:
+        res = _axis_registry.get(key, None)
+        if res is d or (res is not None and np.array_equal(res, d)):
+            return res
+        res = np.array(d, copy=True)
+        res.setflags(write=False)
+        _axis_registry[key] = res
+    return res
+
+
+def merge_axis(a: np.ndarray, b: np.ndarray, x_min=-np.inf, x_max=np.inf) -> np.ndarray:
+    """
+        float_unique(hstack([a,b]),x_min,x_max),  cached per (a,b,x_min,x_max).
+        The cache is keyed by identity, so `a`,`b` should be interned (see `intern_axis`).
+    """
+    if a is None:
+        return b
+    elif b is None or a is b:
+        return a
+
+    key = (id(a), id(b), x_min, x_max)
+
+    with _axis_lock:
+        item = _merged_axis_cache.get(key, None)
+        if item is not None:
+            ref_a, ref_b, res = item
+            if ref_a() is a and ref_b() is b:
+                _merged_axis_cache.move_to_end(key)
+                return res
+            del _merged_axis_cache[key]
+
+    res = intern_axis(float_unique(np.hstack([a, b]), x_min, x_max))
+
+    with _axis_lock:
+        _merged_axis_cache[key] = (weakref.ref(a), weakref.ref(b), res)
+        while len(_merged_axis_cache) > MERGED_AXIS_CACHE_SIZE:
+            _merged_axis_cache.popitem(last=False)
+    return res
+
+
 def array_like(x: np.ndarray, d):
     if isinstance(d, np.ndarray):
         return d
@@ -29,6 +29,24 @@ class TestEntry(unittest.TestCase):
         self.assertEqual(d.pull(["a", 0]),        self.data["a"][0])
         self.assertEqual(d.pull(["a", 1]),        self.data["a"][1])
 
+    def test_put_many(self):
+        d = Entry({"a": {"b": {"c": 1}}, "l": [1, 2]})
+        d.put_many({"a.b.d": 2, "a": {"x": 3}, "q": {"r": {"s": 4}}, "l.0": 5, ("t", "u"): 6})
+        self.assertDictEqual(d.cache, {"a": {"b": {"c": 1, "d": 2}, "x": 3},
+                                       "l": [5, 2], "q": {"r": {"s": 4}}, "t": {"u": 6}})
+
+        d.put_many([("a.b", 1), ("a.b.c", 2)])
+        self.assertDictEqual(d.cache["a"], {"b": {"c": 2}, "x": 3})
+
+        d = Entry({}).put_many({"a.b.c": 1, "a": {"b": 5}, "a.b.d": 7})
+        self.assertDictEqual(d.cache, {"a": {"b": {"d": 7}}})
+
+        with self.assertRaises(KeyError):
+            Entry({"l": [{"x": 1}]}).put_many({"l.x.y": 1})
+
+        d = Entry(None, path=["p"]).update({"a.b": 1}, c=2)
+        self.assertDictEqual(d.cache, {"p": {"a": {"b": 1}, "c": 2}})
+
     def test_find_by_cond(self):
         cache = [
             {"name": "wang wu", "age": 21},
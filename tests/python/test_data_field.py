@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+from spdm.common.logger import logger
+from spdm.data.Field import Field, FieldExpression
+from spdm.mesh.RectilinearMesh import RectilinearMesh
+
+
+class TestField(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mesh = RectilinearMesh(None, np.linspace(1.0, 2.0, 65), np.linspace(-1.0, 1.0, 129))
+        X, Y = self.mesh.xy
+        self.a = Field(np.sin(X)*np.cos(Y), mesh=self.mesh)
+        self.b = Field(X**2+Y, mesh=self.mesh)
+
+    def test_expression(self):
+        a, b = self.a, self.b
+        expr = a*b+2.0*a-np.exp(b)/(b+3.0)
+        self.assertIsInstance(expr, FieldExpression)
+        self.assertTrue(expr.mesh is self.mesh)
+
+        A, B = np.asarray(a), np.asarray(b)
+        expected = A*B+2.0*A-np.exp(B)/(B+3.0)
+        self.assertTrue(np.allclose(np.asarray(expr), expected))
+        self.assertTrue(np.asarray(expr) is np.asarray(expr))
+
+        x = np.asarray([1.2, 1.7])
+        y = np.asarray([-0.3, 0.4])
+        self.assertTrue(np.allclose(expr(x, y), a(x, y)*b(x, y)+2.0*a(x, y)-np.exp(b(x, y))/(b(x, y)+3.0)))
+
+    def test_expression_other_mesh(self):
+        mesh = RectilinearMesh(None, np.linspace(1.0, 2.0, 33), np.linspace(-1.0, 1.0, 41))
+        X, Y = mesh.xy
+        c = Field(X**2+Y, mesh=mesh)
+
+        res = np.asarray(self.a-c)
+        self.assertEqual(res.shape, self.mesh.shape)
+        self.assertTrue(np.allclose(res, np.asarray(self.a)-np.asarray(self.b)))
+
+        # a sub-expression on another mesh is evaluated at the points of this mesh
+        res = np.asarray(self.a-c*2.0)
+        self.assertEqual(res.shape, self.mesh.shape)
+        self.assertTrue(np.allclose(res, np.asarray(self.a)-2.0*np.asarray(self.b)))
+
+    def test_expression_dtype(self):
+        a, b = self.a, self.b
+        A, B = np.asarray(a), np.asarray(b)
+
+        res = np.asarray(a > 0.1)
+        self.assertEqual(res.dtype, bool)
+        self.assertTrue(np.array_equal(res, A > 0.1))
+        self.assertTrue(np.array_equal(np.asarray(a > a), np.zeros_like(res)))
+        self.assertTrue(np.array_equal(np.asarray(a*b > b), A*B > B))
+
+        res = np.asarray((a > 0.1)*b+a)
+        self.assertEqual(res.dtype, float)
+        self.assertTrue(np.allclose(res, (A > 0.1)*B+A))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,9 +2,12 @@ import logging
 import pprint
 import sys
 import unittest
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 from scipy import constants
 import numpy as np
-from spdm.data.Function import Function, Expression, PiecewiseFunction
+from spdm.data.Function import (Expression, Function, FunctionBundle,
+                                PiecewiseFunction, numeric_policy)
 from spdm.common.logger import logger
 
 
@@ -63,6 +66,113 @@ class TestFunction(unittest.TestCase):
 
         self.assertTrue(np.all(y2.x_axis == x2))
 
+    def test_numeric_policy(self):
+        x = np.linspace(0, 1, 11)
+        fun = Function(x, x) / Function(x, x)
+
+        with self.assertRaises(RuntimeError):
+            fun()
+
+        with numeric_policy("ignore"):
+            self.assertTrue(np.isnan(fun()[0]))
+
+        with numeric_policy("record") as record:
+            fun()
+        self.assertEqual(len(record), 1)
+        self.assertTrue(record[0][1][0])
+        self.assertFalse(np.any(record[0][1][1:]))
+
+        # underflow is not an error
+        self.assertTrue(np.all(np.exp(-Function(x, x*1000+700))() >= 0.0))
+
+    def test_adaptive_resample(self):
+        x = np.linspace(0, 1, 1001)
+        fun = Function(x, np.tanh((0.92-x)/0.02))
+        x2 = np.linspace(0, 1, 5000)
+
+        adaptive = fun.resample(0, 1, num=32)
+        uniform = Function(np.linspace(0, 1, 32), fun(np.linspace(0, 1, 32)))
+
+        self.assertEqual(len(adaptive), 32)
+        self.assertLess(np.max(np.abs(adaptive(x2)-fun(x2))), np.max(np.abs(uniform(x2)-fun(x2))))
+
+        fun2 = fun.resample(0, 1, num=200, tolerance=1.0e-3)
+        self.assertLess(len(fun2), 200)
+        self.assertLess(np.max(np.abs(fun2(x2)-fun(x2))), 1.0e-3)
+
+    def test_shared_axis(self):
+        x0 = np.linspace(0, 1, 128)
+        x1 = np.linspace(0, 1, 128)
+        x2 = np.linspace(0, 1, 65)
+        f0 = Function(x0, x0)
+        f1 = Function(x1, x1*2)
+        f2 = Function(x2, x2*3)
+
+        self.assertTrue(f0.x_axis is f1.x_axis)
+        self.assertTrue(np.all(f1(x1) == x1*2))
+
+        e0 = f0+f2
+        e1 = f1*f2
+        self.assertTrue(e0.x_axis is e1.x_axis)
+        self.assertEqual(len(e0.x_axis), 128+65-2)
+
+        # the registered axis is a private read-only copy
+        self.assertFalse(f0.x_axis.flags.writeable)
+        x0[:] = 0.0
+        self.assertTrue(np.array_equal(f1.x_axis, x1))
+
+    def test_parallel_evaluate(self):
+        x = np.linspace(0, 1, 128)
+        f0 = Function(x, np.sin(x))
+        f1 = Function(x, lambda x: x*2)
+        f2 = Function(np.linspace(0, 1, 33), np.linspace(0, 1, 33)**2)
+        expr = (f0+f1)*(f2-f0) + np.exp(f1/2)
+
+        x2 = np.linspace(0, 1, 1000)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            self.assertTrue(np.allclose(expr(x2, executor=executor), expr(x2)))
+
+            with numeric_policy("record") as record:
+                (f0/(f0-f0))(x2, executor=executor)
+            self.assertEqual(len(record), 1)
+
+            # errors in leaves follow the policy as in serial evaluation
+            x3 = np.linspace(0, 1, 11)
+            leaf = Function(x3, lambda x: 1.0/x) + f1
+            with self.assertRaises(RuntimeError):
+                leaf(x3)
+            with self.assertRaises(RuntimeError):
+                leaf(x3, executor=executor)
+            for kwargs in ({}, {"executor": executor}):
+                with warnings.catch_warnings():
+                    warnings.simplefilter("error")
+                    with numeric_policy("record") as record:
+                        leaf(x3, **kwargs)
+                self.assertEqual(len(record), 1)
+                self.assertTrue(record[0][1][0])
+
+    def test_function_bundle(self):
+        x = np.linspace(0, 1.0, 128)
+        bundle = FunctionBundle(x, np.sin(np.outer(np.arange(1, 11), x*constants.pi)), dtype=np.float32)
+
+        fun = bundle[2]
+        self.assertTrue(np.shares_memory(fun._y, np.asarray(bundle)))
+        self.assertEqual(fun().dtype, np.float64)
+        self.assertLess(np.max(np.abs(fun(x[:-1]+0.5/127)-np.sin(3*(x[:-1]+0.5/127)*constants.pi))), 1.0e-5)
+
+        sub = bundle.resample(0.25, 0.75)
+        self.assertTrue(np.shares_memory(np.asarray(sub), np.asarray(bundle)))
+        self.assertTrue(np.shares_memory(fun.resample(0.25, 0.75)._y, np.asarray(bundle)))
+
+        # writing the buffer resets the spline of items already returned
+        self.assertAlmostEqual(fun(0.3), np.sin(0.9*constants.pi), places=5)
+        bundle[2] = np.ones_like(x)
+        self.assertAlmostEqual(fun(0.3), 1.0)
+        fun = bundle[3]
+        self.assertNotAlmostEqual(fun(0.51), 0.0)
+        sub[3] = np.zeros_like(sub.x_axis)
+        self.assertAlmostEqual(fun(0.51), 0.0)
+
     def test_picewise_function(self):
         r_ped = 0.9001  # np.sqrt(0.88)
         Cped = 0.2
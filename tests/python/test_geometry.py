@@ -0,0 +1,146 @@
+import unittest
+
+import numpy as np
+from spdm.common.logger import logger
+from spdm.geometry.BSplineSurface import BSplineSurface
+from spdm.geometry.CubicSplineCurve import CubicSplineCurve
+from spdm.geometry.CubicSplineCurveFamily import CubicSplineCurveFamily
+from spdm.geometry.Curve import (Curve, intersect2d, intersect_polylines,
+                                 intersect_segments, winding_number)
+from spdm.geometry.GeoObjectSet import GeoObjectSet
+
+
+class TestGeometry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.theta = np.linspace(0, 2.0*np.pi, 129)
+        rng = np.random.default_rng(0)
+        self.circles = [(rng.uniform(0.0, 10.0, 2), rng.uniform(0.1, 0.5)) for _ in range(100)]
+        self.curves = [Curve(np.stack([c[0]+r*np.cos(self.theta), c[1]+r*np.sin(self.theta)], axis=-1))
+                       for c, r in self.circles]
+        self.x = rng.uniform(0.0, 10.0, 20000)
+        self.y = rng.uniform(0.0, 10.0, 20000)
+
+    def test_winding_number(self):
+        square = np.asarray([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]])
+        self.assertEqual(winding_number([0.5, 1.5, 0.5], [0.5, 0.5, -0.1], square).tolist(), [1, 0, 0])
+        self.assertEqual(winding_number([0.5], [0.5], square[::-1]).tolist(), [-1])
+
+        (cx, cy), r = self.circles[0]
+        inside = self.curves[0].encloses_point(self.x, self.y)
+        d = np.hypot(self.x-cx, self.y-cy)
+        self.assertTrue(np.all(inside[d < r*0.99]))
+        self.assertFalse(np.any(inside[d > r]))
+        self.assertTrue(self.curves[0].encloses_point(cx, cy))
+
+    def test_geo_object_set(self):
+        objs = GeoObjectSet(self.curves)
+        pt, obj = objs.query(self.x, self.y)
+        self.assertTrue(np.all(np.diff(pt) >= 0))
+
+        for k, ((cx, cy), r) in enumerate(self.circles):
+            found = set(pt[obj == k])
+            d = np.hypot(self.x-cx, self.y-cy)
+            self.assertTrue(set(np.flatnonzero(d < r*0.99)) <= found)
+            self.assertTrue(found <= set(np.flatnonzero(d < r)))
+
+        idx = objs.locate(self.x.reshape(100, 200), self.y.reshape(100, 200))
+        self.assertEqual(idx.shape, (100, 200))
+        self.assertTrue(np.all((idx.ravel() >= 0) == np.isin(np.arange(len(self.x)), pt)))
+
+        # the first object for points in several objects
+        first = np.full(len(self.x), -1)
+        for p, o in zip(pt[::-1], obj[::-1]):
+            first[p] = o
+        self.assertTrue(np.array_equal(idx.ravel(), first))
+
+    def test_intersect_polylines(self):
+        self.assertTrue(np.allclose(intersect2d([0.0, 0.5], [3.0, 0.5], [1.0, 0.0], [1.0, 1.0]), [1.0/3.0, 0.5]))
+
+        # lines of sight from random points, against all circles
+        rng = np.random.default_rng(1)
+        p0 = rng.uniform(0.0, 10.0, (200, 2))
+        p1 = p0+rng.uniform(-3.0, 3.0, (200, 2))
+        los = np.stack([p0, p1], axis=1).reshape(-1, 2)
+        circles = np.concatenate([c.points() for c in self.curves])
+        offsets = np.arange(0, len(self.curves)+1)*len(self.theta)
+
+        i, j, s, t = intersect_polylines(los, circles, np.arange(0, 401, 2), offsets)
+        self.assertTrue(np.all(i % 2 == 0))
+        self.assertTrue(np.allclose(los[i]+s[:, None]*(los[i+1]-los[i]), circles[j]+t[:, None]*(circles[j+1]-circles[j])))
+
+        # brute force, all pairs
+        m = np.flatnonzero((np.arange(len(circles)-1)+1) % len(self.theta) != 0)
+        expected = set()
+        for k in range(0, 400, 2):
+            a, b = intersect_segments(np.tile(los[k], (len(m), 1)), np.tile(los[k+1], (len(m), 1)), circles[m], circles[m+1])
+            expected |= {(k, n) for n in m[(a >= 0) & (a <= 1) & (b >= 0) & (b <= 1)].tolist()}
+        self.assertEqual(set(zip(i.tolist(), j.tolist())), expected)
+
+        self.assertEqual(len(self.curves[0].intersection(Curve(np.asarray([[0.0, 0.0], [10.0, 10.0]])))) % 2, 0)
+
+    def test_curve_family(self):
+        r = np.linspace(0.1, 1.0, 16)
+        points = np.stack([np.stack([r0*0.5*np.cos(self.theta), r0*0.8*np.sin(self.theta)], axis=-1) for r0 in r])
+        family = CubicSplineCurveFamily(points)
+        self.assertEqual(len(family), 16)
+        self.assertTrue(family.is_closed)
+
+        u = np.linspace(0, 1, 33)
+        curves = [CubicSplineCurve(p, [family.u]) for p in points]
+        self.assertTrue(np.allclose(family.points(u), np.stack([c.points(u) for c in curves])))
+        self.assertTrue(np.allclose(family.derivative(u), np.stack([np.stack(c.derivative(u), axis=-1) for c in curves])))
+        self.assertTrue(np.allclose(family.dl, np.stack([c.dl for c in curves])))
+        self.assertTrue(np.allclose(family.length, [c.length for c in curves]))
+        self.assertTrue(np.allclose(family[3].points(u), curves[3].points(u)))
+
+    def test_remesh(self):
+        # ellipse with a strongly non-uniform parameterization
+        t = np.linspace(0, 1, 65)
+        theta = 2.0*np.pi*(t+0.12*np.sin(2.0*np.pi*t))
+        curve = CubicSplineCurve(np.stack([1.5*np.cos(theta), 0.5*np.sin(theta)], axis=-1), [t])
+        self.assertTrue(np.isclose(curve.arc_length[-1], curve.length))
+
+        res = curve.remesh(101)
+        p = res.points()
+        seg = np.hypot(*np.diff(p, axis=0).T)
+        self.assertTrue(np.allclose(seg, seg.mean(), rtol=1.0e-2))
+        self.assertAlmostEqual(res.length, curve.length, places=3)
+
+        u = curve.inverse_arc_length(curve.arc_length)
+        self.assertTrue(np.allclose(u, t))
+
+        half = curve.trim(0.0, 0.5)
+        self.assertAlmostEqual(half.length, np.interp(0.5, t, curve.arc_length), places=3)
+
+        polyline = Curve(np.stack([[0.0, 1.0, 1.0], [0.0, 0.0, 3.0]], axis=-1))
+        self.assertTrue(np.allclose(polyline.remesh(5).points(), [[0, 0], [1, 0], [1, 1], [1, 2], [1, 3]]))
+
+        r = np.linspace(0.1, 1.0, 16)
+        family = CubicSplineCurveFamily(np.stack([np.stack([r0*1.5*np.cos(theta), r0*0.5*np.sin(theta)], axis=-1) for r0 in r]), t)
+        expected = np.stack([family[i].remesh(101).points() for i in range(len(family))])
+        self.assertTrue(np.allclose(family.remesh(101).points(), expected))
+
+    def test_bspline_surface(self):
+        u = np.linspace(0.1, 1.0, 17)
+        v = np.linspace(0.0, 1.0, 33)
+        points = np.stack([np.stack([1.7+r*0.5*np.cos(2.0*np.pi*v), r*0.8*np.sin(2.0*np.pi*v)], axis=-1) for r in u])
+        surf = BSplineSurface(points, [u, v])
+        self.assertEqual(surf.is_closed, [False, True])
+        self.assertTrue(np.allclose(surf.points(u, v), points))
+
+        rng = np.random.default_rng(2)
+        pu = rng.uniform(0.1, 1.0, 1000)
+        pv = rng.uniform(0.0, 1.0, 1000)
+        res = surf.points(pu, pv, grid=False)
+        expected = np.stack([1.7+pu*0.5*np.cos(2.0*np.pi*pv), pu*0.8*np.sin(2.0*np.pi*pv)], axis=-1)
+        self.assertLess(np.max(np.abs(res-expected)), 1.0e-4)
+        self.assertTrue(np.allclose(surf.points(pu, pv+1.0, grid=False), res))
+
+        grid = surf.points(pu[:10], pv[:7])
+        self.assertEqual(grid.shape, (10, 7, 2))
+        self.assertTrue(np.allclose(grid, surf.points(pu[:10, None], pv[None, :7], grid=False)))
+        self.assertTrue(surf.basis_matrix(0, pu[:10]) is surf.basis_matrix(0, pu[:10]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+import unittest
+
+import numpy as np
+from spdm.common.logger import logger
+from spdm.data.Field import Field
+from spdm.geometry.CubicSplineCurve import CubicSplineCurve
+from spdm.geometry.CubicSplineCurveFamily import CubicSplineCurveFamily
+from spdm.mesh.CurvilinearMesh import CurvilinearMesh
+from spdm.mesh.RectilinearMesh import RectilinearMesh
+
+
+class TestRectilinearMesh(unittest.TestCase):
+    def setUp(self) -> None:
+        self.x = np.linspace(1.0, 2.0, 65)
+        self.y = np.linspace(-1.0, 1.0, 129)
+        self.mesh = RectilinearMesh(None, self.x, self.y)
+        X, Y = self.mesh.xy
+        self.values = [np.sin(X*k)*np.cos(Y) for k in range(1, 5)]
+        rng = np.random.default_rng(1)
+        self.px = rng.uniform(1.0, 2.0, 1000)
+        self.py = rng.uniform(-1.0, 1.0, 1000)
+
+    def test_interpolation_operator(self):
+        op = self.mesh.interpolation_operator(self.px, self.py, method="cubic")
+        self.assertEqual(op.shape, (1000, 65*129))
+        self.assertTrue(op is self.mesh.interpolation_operator(self.px, self.py, method="cubic"))
+        self.assertTrue(np.allclose(op.sum(axis=1), 1.0))
+
+        expected = np.stack([Field(v, mesh=self.mesh)(self.px, self.py) for v in self.values])
+        res = self.mesh.interpolate(self.values, self.px, self.py, method="cubic")
+        self.assertEqual(res.shape, (4, 1000))
+        self.assertLess(np.max(np.abs(res-expected)), 1.0e-4)
+
+        field = Field(self.values[0], mesh=self.mesh)
+        self.assertLess(np.max(np.abs(field(self.px, self.py, method="linear")-expected[0])), 1.0e-2)
+
+    def test_uniform_evaluate(self):
+        self.assertTrue(self.mesh.is_uniform)
+        field = Field(self.values[1], mesh=self.mesh)
+        for dx, dy in [(0, 0), (1, 0), (0, 1), (1, 1)]:
+            expected = field.interpolator(self.px, self.py, dx=dx, dy=dy, grid=False)
+            res = self.mesh.evaluate(self.values[1], self.px, self.py, method="cubic", dx=dx, dy=dy)
+            self.assertLess(np.max(np.abs(res-expected)), 1.0e-3)
+
+        x = np.sort(np.append(np.random.default_rng(2).uniform(1.0, 2.0, 63), [1.0, 2.0]))
+        mesh = RectilinearMesh(None, x, self.y)
+        self.assertFalse(mesh.is_uniform)
+        X, Y = mesh.xy
+        res = mesh.evaluate(X*2+Y**2, self.px, self.py, method="cubic")
+        self.assertLess(np.max(np.abs(res-(self.px*2+self.py**2))), 1.0e-10)
+
+    def test_sparse_xy(self):
+        mesh = RectilinearMesh(None, self.x, self.y, sparse_xy=True)
+        X, Y = mesh.xy
+        self.assertEqual((X.shape, Y.shape), ((65, 1), (1, 129)))
+        self.assertTrue(np.shares_memory(X, self.x))
+
+        field = Field(np.sin(X)*np.cos(Y), mesh=mesh)
+        self.assertEqual(field.shape, (65, 129))
+        self.assertTrue(np.allclose(field(), np.asarray(field)))
+        self.assertTrue(np.allclose(field(method="linear"), np.asarray(field)))
+        self.assertTrue(np.allclose(field(self.px, self.py), Field(self.values[0], mesh=self.mesh)(self.px, self.py)))
+
+        for sparse, dense in zip(mesh.dl, self.mesh.dl):
+            self.assertEqual(sparse.shape, (65, 129))
+            self.assertTrue(np.array_equal(sparse, dense))
+        self.assertGreater(np.max(np.abs(mesh.dl[1])), 0.0)
+
+    def test_remap(self):
+        target = RectilinearMesh(None, np.linspace(1.0, 2.0, 40), np.linspace(-1.0, 1.0, 50))
+        _, _, volume = self.mesh.control_volumes()
+        _, _, target_volume = target.control_volumes()
+        self.assertAlmostEqual(volume.sum(), 2.0)
+
+        op = self.mesh.remap_operator(target, method="conservative")
+        self.assertTrue(op is self.mesh.remap_operator(target, method="conservative"))
+
+        # one cache: remap operators are not added to the interpolation operator cache, `order` is ignored
+        num = len(self.mesh._operator_cache)
+        op = self.mesh.remap_operator(target, method="bilinear")
+        self.assertTrue(op is self.mesh.remap_operator(target, method="linear", order=3))
+        self.assertEqual(len(self.mesh._operator_cache), num)
+        self.assertEqual(op.shape, (40*50, 65*129))
+
+        res = self.mesh.remap(self.values, target, method="conservative")
+        self.assertEqual(res.shape, (4, 40, 50))
+        self.assertTrue(np.allclose((res*target_volume).sum(axis=(1, 2)), (np.stack(self.values)*volume).sum(axis=(1, 2))))
+
+        X, Y = target.xy
+        res = self.mesh.remap(self.values[0], target, method="spline")
+        self.assertLess(np.max(np.abs(res-np.sin(X)*np.cos(Y))), 1.0e-5)
+
+    def test_critical_points(self):
+        x = np.linspace(-2.0, 2.0, 129)
+        y = np.linspace(-1.0, 1.1, 65)
+        mesh = RectilinearMesh(None, x, y)
+        X, Y = mesh.xy
+        field = Field((X**2-1)**2+Y**2+0.1*X, mesh=mesh)
+
+        points = sorted(field.find_critical_points())
+        self.assertEqual(len(points), 3)
+        for (px, py, _, det), expected in zip(points, np.sort(np.roots([4, 0, -4, 0.1]))):
+            self.assertAlmostEqual(px, expected, places=3)
+            self.assertAlmostEqual(py, 0.0, places=6)
+        self.assertEqual([int(np.sign(p[3])) for p in points], [1, -1, 1])
+
+        shift = np.linspace(-0.5, 0.5, 8)
+        idx, px, py, _, det = mesh.critical_points(np.stack([(X**2-1)**2+(Y-s)**2 for s in shift]))
+        self.assertEqual(len(idx), 3*8)
+        self.assertTrue(np.allclose(py, shift[idx]))
+
+    def test_contours(self):
+        X, Y = self.mesh.xy
+        field = Field(((X-1.5)/0.4)**2+(Y/0.8)**2, mesh=self.mesh)
+        levels = np.linspace(0.1, 0.8, 8)
+        surfs = field.contours(levels)
+        self.assertIsInstance(surfs, CurvilinearMesh)
+        self.assertEqual(surfs.shape[0], 8)
+        self.assertTrue(surfs is field.contours(levels))
+
+        for level, xy in zip(levels, surfs.xy):
+            x, y = xy.T
+            self.assertLess(np.max(np.abs(((x-1.5)/0.4)**2+(y/0.8)**2-level)), 1.0e-2)
+            self.assertAlmostEqual(x[0], 1.5+0.4*np.sqrt(level), places=2)
+            self.assertAlmostEqual(y[0], 0.0, places=2)
+
+        # decreasing levels: the mesh axis is sorted
+        surfs = field.contours(levels[::-1])
+        self.assertTrue(np.array_equal(surfs.uv[0], levels))
+        self.assertTrue(np.allclose(surfs.xy, field.contours(levels).xy))
+        with self.assertRaises(ValueError):
+            field.contours([0.2, 0.5, 0.2])
+
+
+class TestCurvilinearMesh(unittest.TestCase):
+    def setUp(self) -> None:
+        self.u = np.linspace(0.1, 1.0, 32)
+        self.v = np.linspace(0.0, 1.0, 65)
+        theta = self.v*2.0*np.pi
+        surfs = [CubicSplineCurve(np.stack([1.7+r*0.5*np.cos(theta), r*0.8*np.sin(theta)], axis=-1), [self.v])
+                 for r in self.u]
+        self.surfs = surfs
+        self.mesh = CurvilinearMesh(surfs, [self.u, self.v], cycle=[False, True])
+
+    def test_curve_family(self):
+        mesh = CurvilinearMesh(CubicSplineCurveFamily.from_curves(self.surfs), [self.u, self.v], cycle=[False, True])
+        self.assertTrue(np.allclose(mesh.xy, self.mesh.xy))
+        self.assertTrue(np.allclose(mesh.dl, self.mesh.dl))
+
+    def test_inverse(self):
+        rng = np.random.default_rng(1)
+        r = rng.uniform(0.15, 0.95, 1000)
+        theta = rng.uniform(0.0, 1.0, 1000)
+        x = 1.7+r*0.5*np.cos(theta*2.0*np.pi)
+        y = r*0.8*np.sin(theta*2.0*np.pi)
+
+        u, v = self.mesh.inverse(x, y)
+        self.assertLess(np.max(np.abs(u-r)), 5.0e-3)
+        self.assertLess(np.max(np.abs(v-theta)), 1.0e-2)
+
+        value = np.outer(self.u**2, np.ones_like(self.v))
+        self.assertLess(np.max(np.abs(self.mesh.evaluate(value, x, y)-r**2)), 5.0e-3)
+
+        X, Y = np.meshgrid(np.linspace(1.0, 2.4, 65), np.linspace(-1.0, 1.0, 129), indexing="ij")
+        source = RectilinearMesh(None, np.linspace(1.0, 2.4, 65), np.linspace(-1.0, 1.0, 129))
+        x, y = self.mesh.points
+        for method in ("bilinear", "spline"):
+            res = source.remap(X**2+Y, self.mesh, method=method)
+            self.assertLess(np.max(np.abs(res-(x**2+y))), 1.0e-3)
+        _, _, volume = self.mesh.control_volumes()
+        self.assertAlmostEqual(volume.sum(), np.pi*0.4*(1.0-0.1**2), places=2)
+
+        u, v = self.mesh.inverse(np.asarray([1.7, 3.0]), np.asarray([0.0, 0.0]))
+        self.assertTrue(np.all(np.isnan(u)))
+
+    def test_locate_graded(self):
+        # a wide cell next to many narrow ones: the nearest centers are all narrow cells
+        u = np.hstack([[0.0], np.linspace(10.0, 11.0, 41)])
+        v = np.linspace(0.0, 1.0, 3)
+        mesh = CurvilinearMesh([CubicSplineCurve(np.stack([np.full_like(v, x), v], axis=-1), [v]) for x in u], [u, v])
+
+        i, j, s, t = mesh.locate(np.asarray([9.9, 10.51, 11.5]), np.asarray([0.7, 0.2, 0.5]))
+        self.assertEqual(list(i[:2]), [0, 21])
+        self.assertEqual(list(j[:2]), [1, 0])
+        self.assertAlmostEqual(s[0], 0.99)
+        self.assertAlmostEqual(t[0], 0.4)
+        self.assertEqual(i[2], -1)
+
+    def test_critical_points(self):
+        field = Field(np.outer(self.u**2, np.ones_like(self.v)), mesh=self.mesh)
+        with self.assertRaises(NotImplementedError):
+            list(field.find_critical_points())
+
+    def test_surface_average(self):
+        X, Y = np.moveaxis(self.mesh.xy, -1, 0)
+        rho2 = ((X-1.7)/0.5)**2+(Y/0.8)**2
+
+        # circumference of ellipse, Ramanujan approximation
+        a, b = 0.5*self.u, 0.8*self.u
+        h = ((a-b)/(a+b))**2
+        self.assertTrue(np.allclose(self.mesh.dl.sum(axis=1), np.pi*(a+b)*(1+3*h/(10+np.sqrt(4-3*h))), rtol=1.0e-4))
+
+        weight = 1.0/np.hypot(X-1.7, Y)
+        op = self.mesh.surface_average_operator(weight)
+        self.assertTrue(op is self.mesh.surface_average_operator(weight))
+        self.assertTrue(np.allclose(op.sum(axis=1), 1.0))
+
+        res = self.mesh.surface_average([rho2, X], weight=weight)
+        self.assertTrue(np.allclose(res[0](self.u), self.u**2))
+        self.assertTrue(np.allclose(res[1](self.u), 1.7))
+
+        f = self.mesh.surface_average(lambda x, y: (x-1.7)**2)
+        self.assertTrue(np.all(np.diff(np.asarray(f(self.u))) > 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import io
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+import h5py
+
+import numpy as np
+from spdm.common.logger import logger
+from spdm.plugins.data.file.PluginGEQdsk import (_format_data,
+                                                  sp_convert_geqdsk_batch,
+                                                  sp_geqdsk_to_imas_equilibrium,
+                                                  sp_geqdsk_to_imas_time_slice,
+                                                  sp_read_geqdsk,
+                                                  sp_read_geqdsk_batch,
+                                                  sp_write_geqdsk)
+from spdm.plugins.data.file.PluginHDF5 import H5Entry
+
+GFILE = pathlib.Path(__file__).parent.parent.parent/"examples/data/g063982.04800"
+
+
+def _read_per_value(file, count):
+    """ reference: one float() per 16-character field """
+    data = []
+    for n in range(count):
+        data.append(float(file.read(16).replace("D", "E")))
+        if n >= count - 1 or ((n + 1) % 5 == 0):
+            file.readline()
+    return np.asarray(data)
+
+
+def _write_per_value(file, d):
+    """ reference: the former writer, one write per value """
+    count = len(d)
+    for n in range(count):
+        file.write("%16.9e" % d[n])
+        if (n == count - 1) or ((n + 1) % 5 == 0):
+            file.write('\n')
+
+
+class TestGEQdsk(unittest.TestCase):
+
+    def test_read(self):
+        with open(GFILE) as fid:
+            res = sp_read_geqdsk(fid)
+
+        with open(GFILE) as fid:
+            fid.readline()
+            header = _read_per_value(fid, 20)
+            fpol = _read_per_value(fid, res["nw"])
+            for _ in range(3):
+                _read_per_value(fid, res["nw"])
+            psirz = _read_per_value(fid, res["nw"]*res["nh"])
+            qpsi = _read_per_value(fid, res["nw"])
+            nbbs, limitr = int(fid.read(5)), int(fid.read(5))
+            fid.readline()
+            bbsrz = _read_per_value(fid, nbbs*2)
+
+        self.assertEqual((res["nw"], res["nh"]), (129, 129))
+        self.assertEqual(res["rdim"], header[0])
+        self.assertEqual(res["current"], header[10])
+        self.assertTrue(np.array_equal(res["fpol"], fpol))
+        self.assertTrue(np.array_equal(res["psirz"].ravel(), psirz))
+        self.assertTrue(np.array_equal(res["qpsi"], qpsi))
+        self.assertTrue(np.array_equal(res["bbsrz"].ravel(), bbsrz))
+        self.assertEqual(res["limrz"].shape[0], limitr)
+
+    def test_read_fortran_format(self):
+        # 'D' exponents, glued negative numbers, CRLF line ends and a short last line
+        values = np.linspace(-2.0, 3.0, 23)
+        lines = ["  TEST" + " "*42 + "   0   2   2"]
+        for block in [np.arange(20)*0.5, values[:2], values[2:4], values[4:6], values[6:8], values[8:12], values[12:14]]:
+            fields = [("%16.9E" % v).replace("E", "D") for v in block]
+            lines += ["".join(fields[i:i+5]) for i in range(0, len(fields), 5)]
+        text = "\r\n".join(lines)+"\r\n"
+        self.assertIn("D+00-", text)
+
+        res = sp_read_geqdsk(io.StringIO(text, newline=""))
+        self.assertEqual(res["rmaxis"], 6.5)
+        self.assertTrue(np.allclose(res["fpol"], values[:2]))
+        self.assertTrue(np.allclose(res["psirz"].ravel(), values[8:12]))
+        self.assertTrue(np.allclose(res["qpsi"], values[12:14]))
+        self.assertIsNone(res["bbsrz"])
+
+    def test_write(self):
+        rng = np.random.default_rng(0)
+        for count in [0, 1, 4, 5, 6, 129, 513*513]:
+            d = rng.standard_normal(count)*10.0**rng.integers(-30, 30, count)
+            if count > 3:
+                d[:3] = [0.0, -0.0, np.nan]
+            expected = io.StringIO()
+            _write_per_value(expected, d)
+            self.assertEqual(_format_data(d), expected.getvalue())
+
+        with open(GFILE) as fid:
+            geqdsk = sp_read_geqdsk(fid)
+        geqdsk["description"] = geqdsk["description"].strip()
+        buffer = io.StringIO()
+        sp_write_geqdsk(geqdsk, buffer)
+        res = sp_read_geqdsk(io.StringIO(buffer.getvalue()))
+        self.assertTrue(np.array_equal(res["psirz"], geqdsk["psirz"]))
+        self.assertTrue(np.array_equal(res["limrz"], geqdsk["limrz"]))
+
+    def test_to_imas_equilibrium(self):
+        with open(GFILE) as fid:
+            geqdsk = sp_read_geqdsk(fid)
+        eq = sp_geqdsk_to_imas_equilibrium(geqdsk)._entry.cache
+        self.assertEqual(eq["global_quantities"]["ip"], geqdsk["current"])
+        self.assertTrue(np.array_equal(eq["profiles_2d"]["psi"], geqdsk["psirz"].T))
+        self.assertEqual(eq["profiles_1d"]["grid"]["psi_axis"], geqdsk["simag"])
+
+    def test_convert_batch(self):
+        with open(GFILE) as fid:
+            geqdsk = sp_read_geqdsk(fid)
+        expected = sp_geqdsk_to_imas_time_slice(geqdsk)
+
+        with tempfile.TemporaryDirectory(prefix="spdm_") as temp_dir:
+            temp_dir = pathlib.Path(temp_dir)
+            files = [temp_dir/f"g063982.0{t}" for t in (4900, 4800, 5000)]
+            for f in files:
+                shutil.copy(GFILE, f)
+            (temp_dir/"g063982.05100").write_text("broken")
+            files.append(temp_dir/"g063982.05100")
+            files.append(temp_dir/"g063982.05200")  # missing
+
+            num = sp_convert_geqdsk_batch(files, temp_dir/"equilibrium.h5", max_workers=2, chunksize=1)
+            self.assertEqual(num, 3)
+
+            with h5py.File(temp_dir/"equilibrium.h5", "r") as fid:
+                eq = fid["equilibrium"]
+                self.assertTrue(np.allclose(eq["time"][:], [4.8, 4.9, 5.0]))
+                self.assertEqual(eq["time_slice/profiles_2d/psi"].shape, (3, 129, 129))
+                self.assertTrue(np.array_equal(eq["vacuum_toroidal_field/b0"][:], [geqdsk["bcentr"]]*3))
+
+                # round trip through H5Entry
+                entry = H5Entry(fid)
+                self.assertEqual(len(entry.get("equilibrium.time_slice")), 3)
+                self.assertTrue(np.array_equal(entry.get(["equilibrium", "time_slice", 1, "profiles_2d", "psi"]),
+                                               expected["profiles_2d.psi"]))
+                self.assertEqual(entry.get(["equilibrium", "time_slice", 0, "profiles_2d", "grid_type"]), "rectangular")
+                time_slice = entry.get(["equilibrium", "time_slice", 2])
+                self.assertTrue(np.array_equal(time_slice["boundary"]["outline"]["r"], expected["boundary.outline.r"]))
+                self.assertEqual(time_slice["global_quantities"]["ip"], expected["global_quantities.ip"])
+
+            # a name without time: file order for all slices
+            shutil.copy(GFILE, temp_dir/"equilibrium.geqdsk")
+            t, _ = sp_read_geqdsk_batch([files[1], temp_dir/"equilibrium.geqdsk", files[0]], max_workers=1)
+            self.assertTrue(np.array_equal(t, [0.0, 1.0, 2.0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import pathlib
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+from spdm.common.logger import logger
+from spdm.plugins.data.file.PluginHDF5 import (H5Entry, h5_get_value,
+                                               h5_put_value)
+
+
+class TestH5Entry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="spdm_")
+        self.psi = np.random.default_rng(0).random([8, 65, 129])
+        self.fid = h5py.File(pathlib.Path(self.temp_dir.name)/"test.h5", "w")
+        grp = self.fid.require_group("equilibrium/time_slice/profiles_2d")
+        grp.create_dataset("psi", data=self.psi, chunks=(1, 65, 129))
+        grp.attrs["grid_type"] = "rectangular"
+        self.fid["equilibrium"].create_dataset("time", data=np.linspace(0, 1, 8))
+
+    def tearDown(self) -> None:
+        self.fid.close()
+        self.temp_dir.cleanup()
+
+    def test_lazy_dataset(self):
+        entry = H5Entry(self.fid)
+        psi = entry.get("equilibrium.time_slice.profiles_2d.psi")
+        self.assertIsInstance(psi, H5Entry)
+        self.assertEqual(psi.shape, self.psi.shape)
+        self.assertEqual(psi.dtype, self.psi.dtype)
+        self.assertTrue(np.array_equal(psi[2, :, 5:10], self.psi[2, :, 5:10]))
+        self.assertTrue(np.array_equal(psi[-1], self.psi[-1]))
+        self.assertTrue(np.array_equal(np.asarray(psi), self.psi))
+
+        grp = entry.get("equilibrium.time_slice")
+        self.assertIsInstance(grp["profiles_2d"]["psi"], H5Entry)
+        self.assertEqual(grp["profiles_2d"]["grid_type"], "rectangular")
+        self.assertTrue(np.array_equal(entry.dump()["equilibrium"]["time"], np.linspace(0, 1, 8)))
+
+        # a child entry resolves its path
+        psi = entry.child("equilibrium.time_slice.profiles_2d.psi")
+        self.assertEqual(psi.shape, self.psi.shape)
+        self.assertEqual(psi.ndim, 3)
+        self.assertEqual(psi.dtype, self.psi.dtype)
+        self.assertEqual(len(psi), len(self.psi))
+        self.assertTrue(np.array_equal(np.asarray(psi), self.psi))
+        self.assertEqual(len(entry.child("equilibrium")), 2)
+        with self.assertRaises(TypeError):
+            np.asarray(entry.child("equilibrium.time_slice"))
+
+    def test_hyperslab_path(self):
+        entry = H5Entry(self.fid)
+        res = entry.get(["equilibrium", "time_slice", "profiles_2d", "psi", 3, slice(0, 10)])
+        self.assertTrue(np.array_equal(res, self.psi[3, 0:10]))
+        res = entry.get(["equilibrium.time_slice.profiles_2d.psi", (slice(None), 1, Ellipsis)])
+        self.assertTrue(np.array_equal(res, self.psi[:, 1, ...]))
+
+        child = entry.child("equilibrium.time_slice").child("profiles_2d", "psi", slice(2, 4))
+        self.assertTrue(np.array_equal(child.get(), self.psi[2:4]))
+        self.assertTrue(np.array_equal(child.get([0, 7]), self.psi[2:4, 0, 7]))
+        self.assertEqual(child.shape, (2, 65, 129))
+        self.assertEqual(len(child), 2)
+        self.assertTrue(np.array_equal(np.asarray(child), self.psi[2:4]))
+
+        self.assertTrue(np.array_equal(h5_get_value(self.fid, ["equilibrium", "time", slice(1, 3)]), np.linspace(0, 1, 8)[1:3]))
+        with self.assertRaises(KeyError):
+            entry.get("equilibrium.no_such_node")
+
+    def test_columnar_list(self):
+        rng = np.random.default_rng(1)
+        slices = [{
+            "time": 0.1*idx,
+            "name": f"slice {idx}",
+            "global_quantities": {"ip": rng.random(), "magnetic_axis": {"r": rng.random(), "z": rng.random()}},
+            "profiles_1d": {"q": rng.random(33)},
+            "boundary": {"outline": {"r": rng.random(20+idx % 7)}},
+            "grid": {"points": rng.random([idx % 3+2, 2])},
+        } for idx in range(1000)]
+
+        entry = H5Entry(self.fid)
+        entry.put(["equilibrium", "time_slice"], slices, columnar=True)
+
+        grp = self.fid["equilibrium/time_slice"]
+        self.assertTrue(grp.attrs["__columnar__"])
+        self.assertEqual(len([k for k in grp if k.startswith("__index__")]), 0)
+        self.assertEqual(grp["profiles_1d/q"].shape, (1000, 33))
+
+        res = entry.get("equilibrium.time_slice")
+        self.assertEqual(len(res), 1000)
+        for expected, actual in [(slices[0], res[0]), (slices[999], res[999]), (slices[5], entry.get(["equilibrium", "time_slice", 5]))]:
+            self.assertEqual(actual["name"], expected["name"])
+            self.assertEqual(actual["time"], expected["time"])
+            self.assertEqual(actual["global_quantities"]["magnetic_axis"]["z"], expected["global_quantities"]["magnetic_axis"]["z"])
+            self.assertTrue(np.array_equal(actual["profiles_1d"]["q"], expected["profiles_1d"]["q"]))
+            self.assertTrue(np.array_equal(actual["boundary"]["outline"]["r"], expected["boundary"]["outline"]["r"]))
+            self.assertTrue(np.array_equal(actual["grid"]["points"], expected["grid"]["points"]))
+
+        # projections across the list read one dataset
+        q = entry.get("equilibrium.time_slice.profiles_1d.q")
+        self.assertIsInstance(q, H5Entry)
+        self.assertTrue(np.array_equal(q[10:20, 3], [d["profiles_1d"]["q"][3] for d in slices[10:20]]))
+        self.assertTrue(np.array_equal(entry.get(["equilibrium", "time_slice", slice(2, 5), "global_quantities", "ip"]),
+                                       [d["global_quantities"]["ip"] for d in slices[2:5]]))
+        self.assertEqual(entry.get(["equilibrium", "time_slice", -1, "profiles_1d", "q", 4]), slices[-1]["profiles_1d"]["q"][4])
+        self.assertEqual(list(entry.get("equilibrium.time_slice.name")[:2]), ["slice 0", "slice 1"])
+        outline = entry.get(["equilibrium", "time_slice", slice(0, 3), "boundary", "outline", "r", slice(0, 2)])
+        self.assertTrue(all(np.array_equal(r, d["boundary"]["outline"]["r"][:2]) for r, d in zip(outline, slices)))
+
+        # the length is stored, not inferred from a column
+        h5_put_value(self.fid, ["empty"], [{}, {}, {}], columnar=True)
+        self.assertEqual(len(entry.get("empty")), 3)
+        self.assertEqual(entry.get(["empty", -1]), {})
+
+        # not homogeneous, or columnar=False (default): one group per element
+        h5_put_value(self.fid, ["mixed"], [{"a": 1.0}, {"b": 2.0}], columnar=True)
+        h5_put_value(self.fid, ["groups"], [{"a": 1.0}, {"a": 2.0}])
+        self.assertIn("__index__1", self.fid["mixed"])
+        self.assertIn("__index__1", self.fid["groups"])
+        self.assertEqual(entry.get(["groups", 1, "a"]), 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()